@@ -1,73 +1,387 @@
+import json
+import time
+import hashlib
 import openai
 import logging
-from config import OPENAI_API_KEY, AI_ENGINE
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from cache import TTLCache
+from change_validator import ValidationError, validate_changes
+from file_summary import FileSummarizer
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, AI_ENGINE, PREWARM_WORKERS, ISSUE_CONTEXT_TTL, EDIT_FORMAT,
+    GENERATION_CANDIDATES, GENERATION_CANDIDATE_MODE, GENERATION_TEMPERATURE, MODEL_TIERS, ROUTING_LOG_PATH,
+    DOCS_MAX_PROMPT_CHARS
+)
 from issue_parser import IssueParser
-from typing import Dict, List
+from model_router import CHARS_PER_TOKEN, ERROR, INVALID, SUCCESS, ModelRouter, parse_tiers
+from generation_backend import GenerationBackend, backend_name, get_backend
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+WHOLE_FILE_INSTRUCTIONS = """## Changes
+[For each file, provide the changes in a code block. Start each file's changes with the filename in bold, followed by the code block]"""
+
+EDIT_INSTRUCTIONS = """## Changes
+[For each file, write the filename in bold, followed by one code block containing only SEARCH/REPLACE edits:
+<<<<<<< SEARCH
+lines copied exactly from the current file
+=======
+the lines that replace them
+>>>>>>> REPLACE
+Include just enough unchanged lines in each SEARCH section to make it unique, and use several edits for separate regions. Do not repeat unchanged parts of the file. To create a new file, leave the SEARCH section empty and put the whole file in the REPLACE section.]"""
+
+SYSTEM_PROMPT = "You are a helpful AI assistant that generates code changes based on GitHub issues."
+
+# A tier whose context window leaves less than this for the answer is skipped
+MIN_OUTPUT_TOKENS = 500
+# Tokens for the instructions, issue text, repository info and related issues
+PROMPT_OVERHEAD_TOKENS = 1500
+
+
+class PromptTooLargeError(Exception):
+    """Raised when the prompt leaves too little room for an answer in every tier it could go to."""
+
+    def __init__(self, prompt_tokens: int, tiers: List[Dict]):
+        self.prompt_tokens = prompt_tokens
+        super().__init__(
+            f"Prompt of about {prompt_tokens} tokens is too large for every model tier "
+            f"({', '.join(tier['name'] for tier in tiers)})"
+        )
+
+
 class AIEngine:
     def __init__(self, github_token: str):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        self.engine = AI_ENGINE
-        self.issue_parser = IssueParser(github_token)
+        self.client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        # Backend for tiers that do not name one
+        self.engine = backend_name(AI_ENGINE)
+        self.edit_format = EDIT_FORMAT
+        self.candidates = max(GENERATION_CANDIDATES, 1)
+        self.candidate_mode = GENERATION_CANDIDATE_MODE
+        # Picks the model and token budget per issue, escalating when validation fails
+        self.router = ModelRouter(parse_tiers(MODEL_TIERS, self.engine), ROUTING_LOG_PATH)
+        # Fail at startup, not in a job, on a backend name that is not registered
+        for tier in self.router.tiers:
+            get_backend(tier['backend'])
+        self.issue_parser = IssueParser(github_token, self._code_context_chars())
+        # Large files are summarized once per blob SHA and reused across issues
+        self.file_summarizer = FileSummarizer(self.client)
+        # Background context gathering runs on its own small pool so it never competes with jobs
+        self.prewarm_executor = ThreadPoolExecutor(max_workers=PREWARM_WORKERS, thread_name_prefix='prewarm')
+        self.prewarm_futures: Dict[Tuple[str, int], Future] = {}
+        # Packed prompts, keyed by (repo name, issue number)
+        self.prompt_cache = TTLCache(ISSUE_CONTEXT_TTL)
+        self.lock = threading.Lock()
         logger.info(f"Initialized AI Engine with {self.engine}")
 
-    def generate_code(self, repo_name: str, issue_number: int) -> Dict:
-        """Generate code changes based on the issue and its context."""
+    def _code_context_chars(self) -> int:
+        """
+        The code context that fits the smallest tier's window.
+
+        Room is left for the tier's answer, the rest of the prompt and the
+        largest documentation section, so the index cannot push a prompt
+        past the tier any issue may be routed to.
+        """
+        room = min(
+            get_backend(tier['backend']).context_window(tier['model']) - tier['max_tokens']
+            for tier in self.router.tiers
+        )
+        return max(0, (room - PROMPT_OVERHEAD_TOKENS) * CHARS_PER_TOKEN - DOCS_MAX_PROMPT_CHARS)
+
+    def prewarm(self, repo_name: str, issue_number: int, prefetched: Optional[Dict] = None) -> Future:
+        """
+        Gather and cache the issue's context (and packed prompt) in the background.
+
+        A later generate_code for the same, unchanged issue then starts at the
+        LLM call. Returns the future of the background task.
+        """
+        key = (repo_name, issue_number)
+        with self.lock:
+            future = self.prewarm_futures.get(key)
+            if future and not future.done():
+                return future
+            future = self.prewarm_executor.submit(self._prewarm, repo_name, issue_number, prefetched)
+            self.prewarm_futures[key] = future
+        future.add_done_callback(lambda _: self._forget_prewarm(key, future))
+        return future
+
+    def _prewarm(self, repo_name: str, issue_number: int, prefetched: Optional[Dict]) -> None:
+        try:
+            logger.info(f"Prewarming context for issue #{issue_number} in {repo_name}")
+            issue_data = self.issue_parser.parse_issue(repo_name, issue_number, prefetched)
+            self._get_prompt(repo_name, issue_number, issue_data)
+        except Exception as e:
+            logger.error(f"Error prewarming context: {str(e)}")
+
+    def _forget_prewarm(self, key: Tuple[str, int], future: Future) -> None:
+        with self.lock:
+            if self.prewarm_futures.get(key) is future:
+                del self.prewarm_futures[key]
+
+    def _wait_for_prewarm(self, repo_name: str, issue_number: int) -> None:
+        """Let an in-flight prewarm finish instead of gathering the same context twice."""
+        with self.lock:
+            future = self.prewarm_futures.get((repo_name, issue_number))
+        if future:
+            future.result()
+
+    def apply_push(self, repo_name: str, before: Optional[str], after: str, changed: Set[str],
+                   removed: Set[str], full: bool = False) -> None:
+        """Invalidate the cached context and prompts a push to repo_name's default branch made stale."""
+        self.issue_parser.apply_push(repo_name, before, after, changed, removed, full)
+        # Prompts embed the dropped contexts; summaries are keyed by blob SHA and need nothing
+        self.prompt_cache.invalidate_if(
+            lambda key, value: key[0] == repo_name and self.issue_parser.issue_context_cache.peek(key) is None
+        )
+
+    def _get_prompt(self, repo_name: str, issue_number: int, issue_data: Dict) -> str:
+        """Return the packed prompt, reusing the cached one if its inputs are unchanged."""
+        prompt_key = self._prompt_fingerprint(issue_data)
+        cached = self.prompt_cache.peek((repo_name, issue_number))
+        if cached and cached[0] == prompt_key:
+            return cached[1]
+
+        prompt = self._prepare_gpt4_prompt(issue_data)
+        self.prompt_cache.set((repo_name, issue_number), (prompt_key, prompt))
+        return prompt
+
+    @staticmethod
+    def _prompt_fingerprint(issue_data: Dict) -> str:
+        """
+        Hash everything the prompt is built from.
+
+        Timestamps and state are left out, since they are not in the prompt
+        and change on every /generate. Code files are identified by blob SHA
+        where known, so large files are not rehashed.
+        """
+        issue = issue_data['issue']
+        context = issue_data['context']
+        inputs = {
+            'issue': [issue['title'], issue['body'], issue['labels']],
+            'code': sorted(
+                (path, entry.get('sha') or hashlib.sha256(entry['content'].encode()).hexdigest())
+                for path, entry in context['code_context'].items()
+            ),
+            'documentation': context['documentation'],
+            'related_issues': context['related_issues'],
+            'repository_info': context['repository_info'],
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def generate_code(self, repo_name: str, issue_number: int, prefetched: Optional[Dict] = None) -> Dict:
+        """
+        Generate code changes based on the issue and its context.
+
+        prefetched may carry the webhook payload's 'issue' and 'repository'
+        objects so the parser does not fetch them again.
+        """
         try:
             logger.info(f"Generating code for issue #{issue_number} in {repo_name}")
             
             # Parse the issue and gather context
-            issue_data = self.issue_parser.parse_issue(repo_name, issue_number)
-            
-            if self.engine == "gpt4":
-                return self._generate_with_gpt4(issue_data)
-            elif self.engine == "sweep":
-                return self._generate_with_sweep(issue_data)
-            else:
-                raise ValueError(f"Unsupported AI engine: {self.engine}")
+            issue_data = self.gather_context(repo_name, issue_number, prefetched)
+            return self.generate_from_context(repo_name, issue_number, issue_data)
+
+        except Exception as e:
+            logger.error(f"Error generating code: {str(e)}")
+            raise
+
+    def gather_context(self, repo_name: str, issue_number: int, prefetched: Optional[Dict] = None) -> Dict:
+        """Return the issue_data (issue and context) that generation works from."""
+        self._wait_for_prewarm(repo_name, issue_number)
+        return self.issue_parser.parse_issue(repo_name, issue_number, prefetched)
+
+    def generate_from_context(self, repo_name: str, issue_number: int, issue_data: Dict) -> Dict:
+        """Generate code changes from already gathered issue_data."""
+        try:
+            return self._generate(
+                issue_data,
+                self._get_prompt(repo_name, issue_number, issue_data),
+                repo_name=repo_name
+            )
 
         except Exception as e:
             logger.error(f"Error generating code: {str(e)}")
             raise
 
-    def _generate_with_gpt4(self, issue_data: Dict) -> Dict:
-        """Generate code using GPT-4 with enhanced context."""
+    def _generate(self, issue_data: Dict, prompt: Optional[str] = None, repo_name: Optional[str] = None) -> Dict:
+        """
+        Generate code with the routed model and enhanced context.
+
+        The router picks the model tier and token budget from the issue's
+        features. Each tier is asked for GENERATION_CANDIDATES responses and
+        the first one whose changes pass local validation (parse, Python
+        syntax, target paths in repo_name's tree) is returned, so nothing is
+        written to GitHub for an unusable response. If none pass, the next
+        tier up is tried; ValidationError is raised once no tier is left.
+        Tiers whose context window cannot fit the prompt are skipped, and
+        PromptTooLargeError is raised if that leaves none to try.
+
+        Each call gets its own pool for its candidate requests and the tree
+        listing, so concurrent jobs never queue behind each other's requests.
+        """
+        # Candidate requests plus the tree listing used to validate them
+        executor = ThreadPoolExecutor(max_workers=self.candidates + 1, thread_name_prefix='generate')
         try:
             # Prepare the prompt with enhanced context
-            prompt = self._prepare_gpt4_prompt(issue_data)
+            prompt = prompt or self._prepare_gpt4_prompt(issue_data)
             logger.info(f"Prepared prompt: {prompt[:500]}...")  # Log first 500 chars of prompt
-            
-            # Make the API call
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful AI assistant that generates code changes based on GitHub issues."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            # Log the raw response
-            content = response.choices[0].message.content
-            logger.info(f"Raw AI response: {content[:500]}...")  # Log first 500 chars of response
-            
-            # Parse the response
-            parsed_response = self._parse_gpt4_response(content)
-            logger.info(f"Parsed response: {parsed_response}")
-            
-            return parsed_response
+
+            # The tree listing is fetched while the model is generating
+            tree_future = None
+            if repo_name:
+                tree_future = executor.submit(self.issue_parser.get_tree_paths, repo_name)
+            base_files = {
+                path: entry['content'] for path, entry in issue_data['context']['code_context'].items()
+            }
+
+            start_tier, features = self.router.route(issue_data, self.edit_format)
+            problems = []
+            attempted = False
+            for tier in self.router.tiers[start_tier:]:
+                backend = get_backend(tier['backend'])
+                max_tokens = self._fit_to_context(
+                    backend, tier['model'], prompt, self.router.token_budget(tier, features)
+                )
+                if max_tokens is None:
+                    logger.warning(f"Prompt does not fit the context window of {tier['name']}, skipping it")
+                    continue
+                logger.info(f"Generating with {tier['name']} (max_tokens={max_tokens}) for features {features}")
+                attempted = True
+                started = time.monotonic()
+                try:
+                    parsed_response, tier_problems = self._first_valid_candidate(
+                        prompt, backend, tier['model'], max_tokens, executor, tree_future, base_files
+                    )
+                except Exception:
+                    self.router.record(tier, features, max_tokens, ERROR, time.monotonic() - started)
+                    raise
+                self.router.record(
+                    tier, features, max_tokens, SUCCESS if parsed_response else INVALID, time.monotonic() - started,
+                    candidates=len(tier_problems) + (1 if parsed_response else 0)
+                )
+                if parsed_response:
+                    return parsed_response
+                problems.extend(tier_problems)
+                logger.warning(f"No valid candidate from {tier['name']}")
+
+            if not attempted:
+                raise PromptTooLargeError(self._prompt_tokens(prompt), self.router.tiers[start_tier:])
+            raise ValidationError(problems)
 
         except Exception as e:
-            logger.error(f"Error in GPT-4 generation: {str(e)}")
+            logger.error(f"Error in generation: {str(e)}")
             raise
+        finally:
+            # Requests still running after a candidate won finish in the background
+            executor.shutdown(wait=False)
+
+    def _fit_to_context(self, backend: GenerationBackend, model: str, prompt: str, max_tokens: int) -> Optional[int]:
+        """Shrink max_tokens to what the model's context window leaves after the prompt, or None if too little is left."""
+        available = backend.context_window(model) - self._prompt_tokens(prompt)
+        if available < MIN_OUTPUT_TOKENS:
+            return None
+        return min(max_tokens, available)
+
+    @staticmethod
+    def _prompt_tokens(prompt: str) -> int:
+        return (len(SYSTEM_PROMPT) + len(prompt)) // CHARS_PER_TOKEN
+
+    def _first_valid_candidate(self, prompt: str, backend: GenerationBackend, model: str, max_tokens: int,
+                               executor: ThreadPoolExecutor, tree_future: Optional[Future],
+                               base_files: Dict[str, str]) -> Tuple[Optional[Dict], List[List[str]]]:
+        """Return the first of model's candidates that passes validation, or None, and the rejected ones' problems."""
+        problems = []
+        candidates = self._request_candidates(prompt, backend, model, max_tokens, executor)
+        try:
+            for content in candidates:
+                logger.info(f"Raw AI response: {content[:500]}...")  # Log first 500 chars of response
+                parsed_response = self._parse_candidate(content)
+                candidate_problems = validate_changes(
+                    parsed_response['changes'],
+                    self.edit_format,
+                    self._tree_paths(tree_future),
+                    base_files
+                )
+                if not candidate_problems:
+                    logger.info(f"Parsed response: {parsed_response}")
+                    return parsed_response, problems
+                logger.warning(f"Rejected {model} candidate {len(problems) + 1}: {'; '.join(candidate_problems)}")
+                problems.append(candidate_problems)
+        finally:
+            # Stops waiting on (and cancels queued) requests once a candidate wins
+            candidates.close()
+        return None, problems
+
+    def _tree_paths(self, tree_future: Optional[Future]) -> Optional[set]:
+        """Resolve the tree listing, skipping path checks if it could not be fetched."""
+        if tree_future is None:
+            return None
+        try:
+            return tree_future.result()
+        except Exception as e:
+            logger.warning(f"Could not list repository tree, skipping path checks: {str(e)}")
+            return None
+
+    def _request_candidates(self, prompt: str, backend: GenerationBackend, model: str,
+                            max_tokens: int, executor: ThreadPoolExecutor) -> Iterator[str]:
+        """
+        Yield candidate responses as they arrive.
+
+        In 'n' mode all candidates come from one request with n set. In
+        'parallel' mode, or when the backend cannot return several choices
+        per request, each is its own request and they are yielded in
+        completion order; closing the generator cancels those not started.
+        """
+        if self.candidates == 1 or (self.candidate_mode != 'parallel' and backend.capabilities['n_candidates']):
+            yield from self._complete(prompt, self.candidates, backend, model, max_tokens)
+            return
+
+        futures = [
+            executor.submit(self._complete, prompt, 1, backend, model, max_tokens)
+            for _ in range(self.candidates)
+        ]
+        error = None
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    logger.error(f"Error requesting candidate: {str(e)}")
+                    error = e
+            if error:
+                raise error
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _complete(self, prompt: str, n: int, backend: GenerationBackend, model: str, max_tokens: int) -> List[str]:
+        """Make the backend call, returning the content of each of the n choices."""
+        return backend.complete(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            model,
+            max_tokens,
+            GENERATION_TEMPERATURE,
+            n
+        )
+
+    def _parse_candidate(self, content: str) -> Dict:
+        """Parse one response into explanation, files, changes and considerations."""
+        parsed_response = self._parse_gpt4_response(content)
+        # Code must keep its indentation, which the section parser strips
+        parsed_response['changes'] = self._parse_file_blocks(content)
+        parsed_response['edit_format'] = self.edit_format
+        return parsed_response
 
     def _prepare_gpt4_prompt(self, issue_data: Dict) -> str:
         """Prepare a detailed prompt for GPT-4 with all available context."""
+        issue_text = f"{issue_data['issue']['title']}\n{issue_data['issue']['body'] or ''}"
         prompt = f"""Issue Title: {issue_data['issue']['title']}
 Issue Body: {issue_data['issue']['body']}
 Labels: {', '.join(issue_data['issue']['labels'])}
@@ -81,7 +395,7 @@ Related Issues:
 {self._format_related_issues(issue_data['context']['related_issues'])}
 
 Code Context:
-{self._format_code_context(issue_data['context']['code_context'])}
+{self._format_code_context(issue_data['context']['code_context'], issue_text)}
 
 Documentation:
 {self._format_documentation(issue_data['context']['documentation'])}
@@ -94,8 +408,7 @@ Please generate the necessary code changes to address this issue. Your response
 ## Files to Modify
 [List the files that need to be modified, one per line with a hyphen]
 
-## Changes
-[For each file, provide the changes in a code block. Start each file's changes with the filename in bold, followed by the code block]
+{EDIT_INSTRUCTIONS if self.edit_format == 'diff' else WHOLE_FILE_INSTRUCTIONS}
 
 ## Considerations
 [Any additional considerations or dependencies that need to be addressed]
@@ -126,13 +439,14 @@ Make sure to:
             formatted.append(f"- #{issue['number']}: {issue['title']} ({issue['state']})")
         return "\n".join(formatted)
 
-    def _format_code_context(self, code_context: Dict) -> str:
-        """Format code context for the prompt."""
+    def _format_code_context(self, code_context: Dict, issue_text: str = '') -> str:
+        """Format code context for the prompt, summarizing large files."""
         if not code_context:
             return "No relevant code context found."
         
         formatted = []
-        for path, content in code_context.items():
+        for path, entry in code_context.items():
+            content = self.file_summarizer.render(path, entry['content'], entry.get('sha'), issue_text)
             formatted.append(f"File: {path}\n```\n{content}\n```")
         return "\n".join(formatted)
 
@@ -234,10 +548,42 @@ Make sure to:
         
         return sections
 
-    def _generate_with_sweep(self, issue_data: Dict):
-        """Generate code using Sweep.dev API."""
-        # TODO: Implement Sweep.dev integration when API becomes available
-        raise NotImplementedError("Sweep.dev integration is not yet implemented")
+    def _parse_file_blocks(self, response: str) -> Dict[str, str]:
+        """
+        Collect each bold filename's code block verbatim, preserving indentation.
+
+        Only the first block after a filename belongs to it, and a heading
+        ends the filename's scope, so example commands under later sections
+        (Considerations, Testing) are not taken for file content. A path
+        given several blocks gets them all in diff mode, where each holds
+        separate edits; in whole mode the last one replaces the others.
+        """
+        changes = {}
+        current_file = None
+        block: Optional[List[str]] = None
+        for line in response.split('\n'):
+            stripped = line.strip()
+            if block is not None:
+                if stripped.startswith('```'):
+                    if current_file:
+                        content = '\n'.join(block) + '\n'
+                        if self.edit_format == 'diff':
+                            changes[current_file] = changes.get(current_file, '') + content
+                        else:
+                            if current_file in changes:
+                                logger.warning(f"Several code blocks for {current_file}, using the last one")
+                            changes[current_file] = content
+                    current_file = None
+                    block = None
+                else:
+                    block.append(line)
+            elif stripped.startswith('```'):
+                block = []
+            elif stripped.startswith('#'):
+                current_file = None
+            elif stripped.startswith('**') and stripped.endswith('**') and len(stripped) > 4:
+                current_file = stripped.strip('*').strip('`')
+        return changes
 
     def parse_code_changes(self, ai_response):
         """Parse the AI response into structured code changes."""
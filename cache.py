@@ -0,0 +1,187 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Expired entries are swept, at most once per TTL, while a cache holds more than this many keys
+PURGE_THRESHOLD = 1024
+
+# Shared by all caches; refreshes are short metadata calls
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+
+
+class _Entry:
+    __slots__ = ('value', 'fresh_until', 'stale_until')
+
+    def __init__(self, value: Any, ttl: float, stale_ttl: float):
+        now = time.monotonic()
+        self.value = value
+        self.fresh_until = now + ttl
+        self.stale_until = now + ttl + stale_ttl
+
+
+class TTLCache:
+    """
+    Thread-safe cache with a TTL and stale-while-revalidate refresh.
+
+    A fresh entry is returned as is. An entry past its TTL but still within
+    the stale window is returned immediately while a single background
+    refresh reloads it, so callers only ever wait on a cold miss.
+
+    Every invalidation bumps the cache's generation. A load that was
+    already running when it was bumped is discarded rather than written
+    back, since it may have read the data the invalidation was for. The
+    generation is shared by all keys so nothing has to be kept per key; an
+    invalidation also discards concurrent loads of other keys, which only
+    costs them a later reload.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._refreshing = set()
+        # Bumped by every invalidation and by clear()
+        self._generation = 0
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any], block: bool = True) -> Optional[Any]:
+        """
+        Return the cached value for key, loading it with loader when needed.
+
+        With block=False a cold miss returns None instead of calling loader,
+        for callers that can fetch the value more cheaply themselves.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry.fresh_until:
+                return entry.value
+            generation = self._generation
+            if entry and now < entry.stale_until:
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    _refresh_executor.submit(self._refresh, key, loader, generation)
+                return entry.value
+
+        if not block:
+            return None
+        value = loader()
+        self._set_if_current(key, value, generation)
+        return value
+
+    def generation(self, key: Hashable) -> int:
+        """
+        Token for the current generation, to pass to set() for a value of
+        key loaded outside get(). Take it before starting the load.
+        """
+        with self._lock:
+            return self._generation
+
+    def _set_if_current(self, key: Hashable, value: Any, generation: int) -> None:
+        """Store a loaded value unless the cache was invalidated while it loaded."""
+        with self._lock:
+            if self._generation != generation:
+                logger.info(f"Discarding cache load of {key}: invalidated while loading")
+                return
+            self._store(key, value)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the value for key if it is still fresh, without loading or refreshing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() < entry.fresh_until:
+                return entry.value
+            return None
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], generation: int) -> None:
+        try:
+            self._set_if_current(key, loader(), generation)
+        except Exception as e:
+            logger.error(f"Error refreshing cache entry {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Store value for key. With a token from generation(), the value is
+        discarded if the cache was invalidated since the token was taken.
+        """
+        if generation is not None:
+            self._set_if_current(key, value, generation)
+            return
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        # Called with the lock held
+        self._entries[key] = _Entry(value, self.ttl, self.stale_ttl)
+        if len(self._entries) > PURGE_THRESHOLD:
+            now = time.monotonic()
+            if now >= self._next_purge:
+                for expired in [k for k, entry in self._entries.items() if entry.stale_until <= now]:
+                    del self._entries[expired]
+                self._next_purge = now + self.ttl
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def invalidate_if(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which predicate(key, value) is true, returning how many were dropped."""
+        with self._lock:
+            matching = [key for key, entry in self._entries.items() if predicate(key, entry.value)]
+            for key in matching:
+                del self._entries[key]
+            if matching:
+                self._generation += 1
+            return len(matching)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache for content-addressed values.
+
+    Entries never expire since their key changes with their content; the
+    least recently used is evicted once maxsize is reached.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, loading it with loader on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
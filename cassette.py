@@ -0,0 +1,91 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterator, Mapping
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A cassette is a directory holding one JSON-lines file per kind of traffic
+WEBHOOKS_FILE = 'webhooks.jsonl'
+HTTP_FILE = 'http.jsonl'
+
+# Delivery headers needed to replay a webhook; anything else is left out of the cassette
+WEBHOOK_HEADERS = (
+    'Content-Type', 'User-Agent', 'X-GitHub-Event', 'X-GitHub-Delivery', 'X-GitHub-Hook-ID', 'X-Hub-Signature-256'
+)
+
+
+def body_digest(body: bytes) -> str:
+    """Key for matching a replayed request to a recorded one without storing its body."""
+    return hashlib.sha256(body or b'').hexdigest()
+
+
+def encode_body(body: bytes) -> Dict:
+    """Store a body as text when it is UTF-8, base64 otherwise."""
+    try:
+        return {'body': body.decode('utf-8'), 'encoding': 'utf-8'}
+    except UnicodeDecodeError:
+        return {'body': base64.b64encode(body).decode('ascii'), 'encoding': 'base64'}
+
+
+def decode_body(entry: Dict) -> bytes:
+    if entry.get('encoding') == 'base64':
+        return base64.b64decode(entry['body'])
+    return entry['body'].encode('utf-8')
+
+
+class Cassette:
+    """Append-only recording of one kind of traffic; each entry is written and flushed as one line."""
+
+    def __init__(self, directory: str, name: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, name)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+        logger.info(f"Recording to {self.path}")
+
+    def record(self, entry: Dict) -> None:
+        line = json.dumps(entry) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def record_webhook(self, headers: Mapping[str, str], body: bytes, status: int, started: float,
+                       duration: float) -> None:
+        """Record a delivery with the headers needed to replay it and how the server answered."""
+        try:
+            entry = {
+                'type': 'webhook',
+                'time': started,
+                'headers': {name: headers[name] for name in WEBHOOK_HEADERS if name in headers},
+                'status': status,
+                'duration': duration,
+            }
+            entry.update(encode_body(body))
+            self.record(entry)
+        except Exception as e:
+            # Recording must never fail a delivery
+            logger.error(f"Error recording webhook: {str(e)}")
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+def read_entries(directory: str, name: str) -> Iterator[Dict]:
+    """Yield a cassette file's entries in recorded order, skipping a torn last line."""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable line in {path}")
+
@@ -0,0 +1,99 @@
+import ast
+import posixpath
+import logging
+from typing import Dict, List, Optional, Set
+
+from patch_applier import PatchError, apply_edits, parse_search_replace, parse_unified_diff
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ValidationError(Exception):
+    """Raised when no generated candidate passes local validation."""
+
+    def __init__(self, problems: List[List[str]]):
+        self.problems = problems
+        summary = '; '.join(
+            f"candidate {index + 1}: {', '.join(candidate)}" for index, candidate in enumerate(problems)
+        )
+        super().__init__(f"No valid candidate among {len(problems)} generated: {summary}")
+
+
+def _is_creation(edit_text: str) -> bool:
+    """Whether a SEARCH/REPLACE edit only creates a file (every SEARCH section empty)."""
+    try:
+        blocks = parse_search_replace(edit_text)
+    except PatchError:
+        return False
+    return bool(blocks) and all(not search.strip() for search, _ in blocks)
+
+
+def _check_syntax(path: str, content: str) -> Optional[str]:
+    """Return a problem description if a Python file does not parse."""
+    if not path.endswith('.py'):
+        return None
+    try:
+        ast.parse(content, filename=path)
+    except SyntaxError as e:
+        return f"{path}: syntax error at line {e.lineno}: {e.msg}"
+    return None
+
+
+def validate_changes(changes: Dict[str, str], edit_format: str = 'whole', tree_paths: Optional[Set[str]] = None,
+                     base_files: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Check generated changes locally, before anything is written to GitHub.
+
+    changes maps file paths to new content (edit_format='whole') or to
+    SEARCH/REPLACE edits or a unified diff (edit_format='diff'). tree_paths
+    holds every file and directory path on the default branch; when it is
+    None the path checks are skipped. base_files maps paths to their current
+    content where it is already known, so diff edits against them can be
+    applied and the result checked too. Returns a list of problems, empty if
+    the changes are usable.
+    """
+    if not changes:
+        return ['no file changes found in the response']
+
+    base_files = base_files or {}
+    problems = []
+    for path, content in changes.items():
+        normalized = posixpath.normpath(path)
+        if not path or path.startswith('/') or normalized.startswith('..'):
+            problems.append(f"{path or '(empty path)'}: not a path inside the repository")
+            continue
+
+        exists = tree_paths is None or normalized in tree_paths
+        if not exists:
+            parent = posixpath.dirname(normalized)
+            # A new file is fine if it lands in an existing directory and, in diff mode, only creates
+            if parent and parent not in tree_paths:
+                problems.append(f"{path}: neither the file nor its directory exists")
+                continue
+            if edit_format == 'diff' and not _is_creation(content):
+                problems.append(f"{path}: edits target a file that does not exist")
+                continue
+
+        if edit_format == 'diff':
+            base = base_files.get(normalized, '' if not exists else None)
+            if base is None:
+                # The file exists but its content was not fetched; only check the edits are well formed
+                try:
+                    if not parse_search_replace(content) and not parse_unified_diff(content):
+                        problems.append(f"{path}: no SEARCH/REPLACE edits or diff hunks")
+                except PatchError as e:
+                    problems.append(f"{path}: {str(e)}")
+                continue
+            try:
+                content = apply_edits(base, content)
+            except PatchError as e:
+                problems.append(f"{path}: {str(e)}")
+                continue
+
+        syntax_problem = _check_syntax(path, content)
+        if syntax_problem:
+            problems.append(syntax_problem)
+
+    return problems
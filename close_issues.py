@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 """
 Script to close open GitHub issues and pull requests, and delete their associated branches.
+
+The default mode walks open items one at a time through the REST API. The
+--bulk mode enumerates them with GraphQL, closes them and deletes their
+branches in batched GraphQL mutations sent concurrently under a shared
+rate limiter, and supports --dry-run and filtering by label, author or
+bot-created items.
 """
 
 import os
+import json
 import logging
-from github import Github
+import argparse
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from config import BRANCH_PREFIX, GITHUB_API_URL, BULK_BATCH_SIZE, BULK_WORKERS
+from http_client import get_github
+from github_graphql import GraphQLClient, delete_ref_operation, rest_call, run_mutations
+from rate_limiter import RateLimiter
 
 # Configure logging
 logging.basicConfig(
@@ -41,7 +53,7 @@ def close_issues_and_prs():
             return
 
         # Initialize GitHub client
-        g = Github(github_token)
+        g = get_github(github_token)
         repo = g.get_repo(repository)
 
         # Get all open issues and PRs
@@ -60,16 +72,16 @@ def close_issues_and_prs():
                     delete_branch(repo, branch_name)
                 else:
                     # It's an issue
-                    # Check if there's a branch named after the issue
-                    branch_name = f"issue-{item.number}"
-                    try:
-                        # Try to get the branch to see if it exists
-                        repo.get_branch(branch_name)
-                        # If we get here, the branch exists
-                        delete_branch(repo, branch_name)
-                    except:
-                        # Branch doesn't exist, that's fine
-                        pass
+                    # Check if there's a branch named after the issue (older runs used issue-N)
+                    for branch_name in (f"{BRANCH_PREFIX}{item.number}", f"issue-{item.number}"):
+                        try:
+                            # Try to get the branch to see if it exists
+                            repo.get_branch(branch_name)
+                            # If we get here, the branch exists
+                            delete_branch(repo, branch_name)
+                        except:
+                            # Branch doesn't exist, that's fine
+                            pass
                     item.edit(state='closed')
                     logger.info(f"Closed issue #{item.number}: {item.title}")
 
@@ -81,5 +93,185 @@ def close_issues_and_prs():
     except Exception as e:
         logger.error(f"Error in close_issues_and_prs: {str(e)}")
 
+OPEN_ITEMS_QUERY = """
+query($owner: String!, $name: String!, $labels: [String!], $issuesCursor: String, $prsCursor: String,
+      $withIssues: Boolean!, $withPrs: Boolean!) {
+  viewer { login }
+  repository(owner: $owner, name: $name) {
+    issues(states: OPEN, first: 100, after: $issuesCursor, labels: $labels) @include(if: $withIssues) {
+      pageInfo { hasNextPage endCursor }
+      nodes { id number title author { login __typename } }
+    }
+    pullRequests(states: OPEN, first: 100, after: $prsCursor, labels: $labels) @include(if: $withPrs) {
+      pageInfo { hasNextPage endCursor }
+      nodes { id number title author { login __typename } headRefName headRef { id } isCrossRepository }
+    }
+  }
+}
+"""
+
+def _list_open_items(client: GraphQLClient, owner: str, name: str,
+                     labels: Optional[List[str]]) -> Tuple[str, List[Dict]]:
+    """Enumerate open issues and PRs, 100 of each per GraphQL page."""
+    items = []
+    viewer = None
+    variables = {
+        'owner': owner, 'name': name, 'labels': labels or None,
+        'issuesCursor': None, 'prsCursor': None, 'withIssues': True, 'withPrs': True
+    }
+    while variables['withIssues'] or variables['withPrs']:
+        data = client.execute(OPEN_ITEMS_QUERY, variables)
+        viewer = data['viewer']['login']
+        repository = data['repository']
+        for kind, key, cursor, flag in (('issue', 'issues', 'issuesCursor', 'withIssues'),
+                                         ('pr', 'pullRequests', 'prsCursor', 'withPrs')):
+            if not variables[flag]:
+                continue
+            connection = repository[key]
+            items.extend(dict(node, kind=kind) for node in connection['nodes'])
+            variables[flag] = connection['pageInfo']['hasNextPage']
+            variables[cursor] = connection['pageInfo']['endCursor']
+    return viewer, items
+
+def _is_bot_item(item: Dict, viewer: Optional[str] = None) -> bool:
+    """
+    Whether an item was created by this bot (or any GitHub App).
+
+    With viewer, items authored by that login count too. That is only right
+    when the token is the bot's own account, since with a personal token it
+    matches all of that person's issues and PRs.
+    """
+    author = item.get('author') or {}
+    if author.get('__typename') == 'Bot' or (viewer and author.get('login') == viewer):
+        return True
+    head = item.get('headRefName') or ''
+    return head.startswith(BRANCH_PREFIX) or head.startswith('issue-')
+
+def _find_issue_branches(client: GraphQLClient, owner: str, name: str, issues: List[Dict]) -> Dict[str, str]:
+    """Look up the branches named after the given issues, returning {branch name: ref id}."""
+    branches = {}
+    candidates = [
+        branch_name
+        for issue in issues
+        for branch_name in (f"issue-{issue['number']}", f"{BRANCH_PREFIX}{issue['number']}")
+    ]
+    for start in range(0, len(candidates), 100):
+        chunk = candidates[start:start + 100]
+        fields = ' '.join(
+            f'b{i}: ref(qualifiedName: {json.dumps("refs/heads/" + branch_name)}) {{ id name }}'
+            for i, branch_name in enumerate(chunk)
+        )
+        query = f'query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}'
+        repository = client.execute(query, {'owner': owner, 'name': name})['repository']
+        for ref in repository.values():
+            if ref:
+                branches[ref['name']] = ref['id']
+    return branches
+
+def _close_operation(repository: str, item: Dict) -> Dict:
+    if item['kind'] == 'pr':
+        mutation = f"closePullRequest(input: {{pullRequestId: {json.dumps(item['id'])}}}) {{ clientMutationId }}"
+        description = f"close PR #{item['number']}: {item['title']}"
+    else:
+        mutation = f"closeIssue(input: {{issueId: {json.dumps(item['id'])}}}) {{ clientMutationId }}"
+        description = f"close issue #{item['number']}: {item['title']}"
+    url = f"{GITHUB_API_URL}/repos/{repository}/issues/{item['number']}"
+    return {
+        'mutation': mutation,
+        'description': description,
+        'fallback': lambda client: rest_call(client, 'PATCH', url, json={'state': 'closed'})
+    }
+
+def bulk_close(labels: Optional[List[str]] = None, author: Optional[str] = None, bot_only: bool = False,
+               dry_run: bool = False, batch_size: int = BULK_BATCH_SIZE, workers: int = BULK_WORKERS,
+               github_token: Optional[str] = None, include_viewer: bool = False) -> None:
+    """
+    Close matching open issues and PRs and delete their branches in concurrent GraphQL batches.
+
+    Everything, including the REST fallback for failed mutations, runs as
+    github_token, or GITHUB_TOKEN from the environment if none is given.
+    With bot_only, include_viewer also counts the token owner's own items as
+    the bot's.
+    """
+    try:
+        # Load environment variables
+        load_dotenv()
+        github_token = github_token or os.getenv('GITHUB_TOKEN')
+        repository = os.getenv('REPOSITORY')
+
+        if not github_token or not repository:
+            logger.error("Missing required environment variables")
+            return
+
+        owner, name = repository.split('/')
+        limiter = RateLimiter()
+        client = GraphQLClient(github_token, limiter)
+
+        viewer, items = _list_open_items(client, owner, name, labels)
+        if author:
+            items = [item for item in items if (item.get('author') or {}).get('login') == author]
+        if bot_only:
+            items = [item for item in items if _is_bot_item(item, viewer if include_viewer else None)]
+        logger.info(f"Found {len(items)} matching open issues and PRs")
+
+        # Branches to delete: PR heads in this repository, and branches named after issues
+        branches = {
+            item['headRefName']: item['headRef']['id']
+            for item in items
+            if item['kind'] == 'pr' and item.get('headRef') and not item['isCrossRepository']
+        }
+        branches.update(_find_issue_branches(client, owner, name, [item for item in items if item['kind'] == 'issue']))
+
+        if dry_run:
+            for item in items:
+                kind = 'PR' if item['kind'] == 'pr' else 'issue'
+                logger.info(f"[dry run] Would close {kind} #{item['number']}: {item['title']}")
+            for branch_name in sorted(branches):
+                logger.info(f"[dry run] Would delete branch: {branch_name}")
+            return
+
+        closes = [_close_operation(repository, item) for item in items]
+        closed = run_mutations(client, closes, batch_size, workers)
+
+        # PRs are closed first so deleting their head branches does not race the close
+        deletes = [
+            delete_ref_operation(repository, branch_name, ref_id)
+            for branch_name, ref_id in branches.items()
+        ]
+        deleted = run_mutations(client, deletes, batch_size, workers)
+
+        logger.info(f"Finished bulk close: closed {closed}/{len(closes)} items, deleted {deleted}/{len(deletes)} branches")
+
+    except Exception as e:
+        logger.error(f"Error in bulk_close: {str(e)}")
+
 if __name__ == "__main__":
-    close_issues_and_prs() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Close open issues and PRs and delete their branches.')
+    parser.add_argument('--bulk', action='store_true', help='Use concurrent, batched GraphQL mutations')
+    parser.add_argument('--dry-run', action='store_true', help='Only log what would be closed or deleted (bulk mode)')
+    parser.add_argument('--label', action='append', dest='labels', help='Only items with this label; may be repeated (bulk mode)')
+    parser.add_argument('--author', help='Only items opened by this user (bulk mode)')
+    parser.add_argument('--bot-only', action='store_true', help='Only items created by the bot (bulk mode)')
+    parser.add_argument('--include-viewer', action='store_true',
+                        help="With --bot-only, also count the token owner's items as the bot's (bulk mode)")
+    parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE, help='Mutations per GraphQL request')
+    parser.add_argument('--workers', type=int, default=BULK_WORKERS, help='Concurrent GraphQL requests')
+    args = parser.parse_args()
+
+    if not args.bulk and (args.dry_run or args.labels or args.author or args.bot_only):
+        parser.error("--dry-run, --label, --author and --bot-only require --bulk")
+    if args.include_viewer and not args.bot_only:
+        parser.error("--include-viewer requires --bot-only")
+
+    if args.bulk:
+        bulk_close(
+            labels=args.labels,
+            author=args.author,
+            bot_only=args.bot_only,
+            include_viewer=args.include_viewer,
+            dry_run=args.dry_run,
+            batch_size=args.batch_size,
+            workers=args.workers
+        )
+    else:
+        close_issues_and_prs() 
\ No newline at end of file
@@ -0,0 +1,96 @@
+import re
+import ast
+import logging
+from typing import Dict, List, Set
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')
+
+# Declaration lines in common non-Python languages; group 1 is the declared name
+DECLARATION_PATTERN = re.compile(
+    r'^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|internal\s+)?'
+    r'(?:static\s+)?(?:abstract\s+)?(?:async\s+)?'
+    r'(?:function\*?|class|interface|struct|enum|trait|impl|type|func|fn|def|module)\s+'
+    r'(?:\([^)]*\)\s*)?([A-Za-z_][A-Za-z0-9_]*)'
+)
+
+
+def identifiers(text: str) -> Set[str]:
+    """Return the identifier-like words in text, lowercased, including the parts of snake_case names."""
+    words = set()
+    for word in IDENTIFIER_PATTERN.findall(text or ''):
+        word = word.lower()
+        words.add(word)
+        words.update(part for part in word.split('_') if len(part) > 2)
+    return words
+
+
+def _python_header(lines: List[str], node: ast.AST) -> str:
+    """Return a definition's header lines (up to its body), joined on one line."""
+    body_start = node.body[0].lineno if node.body else node.lineno + 1
+    header = lines[node.lineno - 1:max(body_start - 1, node.lineno)]
+    return ' '.join(line.strip() for line in header).rstrip()
+
+
+def _python_symbols(content: str) -> List[Dict]:
+    """Extract classes, functions and methods with their signatures and docstrings."""
+    lines = content.splitlines()
+    symbols = []
+
+    def visit(nodes, parent=None):
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{parent}.{node.name}" if parent else node.name
+                docstring = ast.get_docstring(node) or ''
+                symbols.append({
+                    'name': name,
+                    'kind': 'class' if isinstance(node, ast.ClassDef) else 'function',
+                    'signature': _python_header(lines, node),
+                    'doc': docstring.strip().splitlines()[0] if docstring.strip() else '',
+                    'start': node.lineno,
+                    'end': node.end_lineno,
+                })
+                if isinstance(node, ast.ClassDef):
+                    visit(node.body, name)
+
+    visit(ast.parse(content).body)
+    return symbols
+
+
+def _declaration_symbols(content: str) -> List[Dict]:
+    """Extract declarations by line pattern; each runs until the next one."""
+    lines = content.splitlines()
+    symbols = []
+    for number, line in enumerate(lines, start=1):
+        match = DECLARATION_PATTERN.match(line)
+        if match:
+            if symbols:
+                symbols[-1]['end'] = number - 1
+            symbols.append({
+                'name': match.group(1),
+                'kind': 'declaration',
+                'signature': line.strip().rstrip('{').rstrip(),
+                'doc': '',
+                'start': number,
+                'end': len(lines),
+            })
+    return symbols
+
+
+def extract_symbols(path: str, content: str) -> List[Dict]:
+    """
+    Return the symbols defined in a file.
+
+    Each symbol is a dict with name, kind, signature, doc (first docstring
+    line) and its 1-based start and end lines. Python files are parsed with
+    ast; other files, or Python that does not parse, by declaration pattern.
+    """
+    if path.endswith('.py'):
+        try:
+            return _python_symbols(content)
+        except (SyntaxError, ValueError) as e:
+            logger.warning(f"Could not parse {path}, falling back to declaration patterns: {str(e)}")
+    return _declaration_symbols(content)
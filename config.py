@@ -8,22 +8,140 @@ load_dotenv()
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 REPOSITORY = os.getenv('REPOSITORY', 'owner/repo')
 BRANCH_PREFIX = os.getenv('BRANCH_PREFIX', 'issue2pr-')
+# Edit one status comment per job as it progresses; the outcome is written into it
+PROGRESS_COMMENTS = os.getenv('PROGRESS_COMMENTS', 'true').lower() == 'true'
+# Label added to an issue once its PR is open; empty adds none
+PR_CREATED_LABEL = os.getenv('PR_CREATED_LABEL', '')
+# On a rerun, 'reset' rebuilds the issue branch on the current base; 'append' adds a commit on top
+RERUN_BRANCH_MODE = os.getenv('RERUN_BRANCH_MODE', 'reset')
+# Point at a GitHub Enterprise server, or at load_test.py's proxy to record or replay traffic
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# HTTP Transport Configuration
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+
+# GitHub Rate Limiting
+GITHUB_REQUESTS_PER_SECOND = float(os.getenv('GITHUB_REQUESTS_PER_SECOND', '10'))
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv('GITHUB_RATE_LIMIT_RESERVE', '100'))
+
+# Bulk close (close_issues.py --bulk): mutations per GraphQL request and requests in flight
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '25'))
+BULK_WORKERS = int(os.getenv('BULK_WORKERS', '4'))
+
+# Branch GC (delete_branches.py --gc): deletions per GraphQL request, requests in flight,
+# and the age in days past which branches without a PR are collected (unset: never)
+GC_BATCH_SIZE = int(os.getenv('GC_BATCH_SIZE', '50'))
+GC_WORKERS = int(os.getenv('GC_WORKERS', '4'))
+GC_MAX_AGE_DAYS = float(os.getenv('GC_MAX_AGE_DAYS')) if os.getenv('GC_MAX_AGE_DAYS') else None
 
 # AI Configuration
+# Generation backend for model tiers that do not name one: 'openai' ('gpt4'), 'local' or a registered plugin
 AI_ENGINE = os.getenv('AI_ENGINE', 'gpt4')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Unset uses the OpenAI API; set to another compatible endpoint or load_test.py's proxy
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+EDIT_FORMAT = os.getenv('EDIT_FORMAT', 'whole')  # or 'diff'
+# Responses requested per generation; the first one that passes local validation is used
+GENERATION_CANDIDATES = int(os.getenv('GENERATION_CANDIDATES', '1'))
+GENERATION_CANDIDATE_MODE = os.getenv('GENERATION_CANDIDATE_MODE', 'n')  # or 'parallel'
+GENERATION_TEMPERATURE = float(os.getenv('GENERATION_TEMPERATURE', '0.7'))
+
+# Model routing: [backend@]model[:max_tokens] tiers, smallest first. Small issues start on the
+# first tier, others on the second; a tier whose output fails validation escalates
+# to the next.
+# The defaults' 128k-token windows fit the code context and docs a prompt can carry
+MODEL_TIERS = os.getenv('MODEL_TIERS', 'gpt-4o-mini:2000,gpt-4o:2000')
+ROUTING_SMALL_LABELS = [label.strip().lower() for label in os.getenv(
+    'ROUTING_SMALL_LABELS', 'typo,documentation,docs,good first issue'
+).split(',') if label.strip()]
+ROUTING_LARGE_LABELS = [label.strip().lower() for label in os.getenv(
+    'ROUTING_LARGE_LABELS', 'feature,enhancement,refactor'
+).split(',') if label.strip()]
+ROUTING_SMALL_MAX_BODY_CHARS = int(os.getenv('ROUTING_SMALL_MAX_BODY_CHARS', '1500'))
+ROUTING_SMALL_MAX_FILES = int(os.getenv('ROUTING_SMALL_MAX_FILES', '1'))
+ROUTING_SMALL_MAX_DIFF_TOKENS = int(os.getenv('ROUTING_SMALL_MAX_DIFF_TOKENS', '800'))
+# OpenAI-compatible server for the 'local' backend (vLLM, llama.cpp server, Ollama)
+LOCAL_BACKEND_URL = os.getenv('LOCAL_BACKEND_URL', 'http://localhost:8000/v1')
+LOCAL_BACKEND_API_KEY = os.getenv('LOCAL_BACKEND_API_KEY', '')
+LOCAL_BACKEND_CONTEXT = int(os.getenv('LOCAL_BACKEND_CONTEXT', '8192'))
+LOCAL_BACKEND_N_CANDIDATES = os.getenv('LOCAL_BACKEND_N_CANDIDATES', 'false').lower() == 'true'
+LOCAL_BACKEND_TIMEOUT = float(os.getenv('LOCAL_BACKEND_TIMEOUT', '300'))
+# Per-attempt routing records (features, tier, latency, outcome); empty disables
+ROUTING_LOG_PATH = os.getenv('ROUTING_LOG_PATH', '.jobs/routing.jsonl')
+
+# Context Configuration
+CONTEXT_FETCHER = os.getenv('CONTEXT_FETCHER', 'graphql')  # or 'rest'
+REPO_CACHE_TTL = float(os.getenv('REPO_CACHE_TTL', '3600'))
+REPO_CACHE_STALE_TTL = float(os.getenv('REPO_CACHE_STALE_TTL', '86400'))
+ISSUE_CONTEXT_TTL = float(os.getenv('ISSUE_CONTEXT_TTL', '1800'))
+PREWARM_CONTEXT = os.getenv('PREWARM_CONTEXT', 'true').lower() == 'true'
+PREWARM_WORKERS = int(os.getenv('PREWARM_WORKERS', '1'))
+
+# Files longer than this many characters are summarized, with only relevant regions in full
+MAX_FILE_CONTEXT_CHARS = int(os.getenv('MAX_FILE_CONTEXT_CHARS', '8000'))
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'structural')  # or 'llm'
+SUMMARY_MODEL = os.getenv('SUMMARY_MODEL', 'gpt-3.5-turbo')
+SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', '1000'))
+
+# Documentation loaded into the prompt
+DOCS_MAX_FILE_BYTES = int(os.getenv('DOCS_MAX_FILE_BYTES', '100000'))
+DOCS_MAX_FETCH_BYTES = int(os.getenv('DOCS_MAX_FETCH_BYTES', '300000'))
+DOCS_MAX_PROMPT_CHARS = int(os.getenv('DOCS_MAX_PROMPT_CHARS', '12000'))
+DOCS_MAX_FILES = int(os.getenv('DOCS_MAX_FILES', '10'))
+
+# Symbol index used to pick the code relevant to an issue
+SYMBOL_INDEX = os.getenv('SYMBOL_INDEX', 'true').lower() == 'true'
+SYMBOL_INDEX_DIR = os.getenv('SYMBOL_INDEX_DIR', '.symbol_index')
+SYMBOL_INDEX_RESULTS = int(os.getenv('SYMBOL_INDEX_RESULTS', '5'))
+SYMBOL_INDEX_TTL = float(os.getenv('SYMBOL_INDEX_TTL', '300'))
+SYMBOL_INDEX_MAX_FILE_BYTES = int(os.getenv('SYMBOL_INDEX_MAX_FILE_BYTES', '200000'))
+
+# Issue events that start code generation; others only prewarm context
+AUTO_GENERATE_ACTIONS = [action.strip() for action in os.getenv('AUTO_GENERATE_ACTIONS', 'opened,labeled').split(',')]
 
 # Slack Configuration
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 SLACK_CHANNEL = os.getenv('SLACK_CHANNEL', '#general')
+SLACK_API_URL = os.getenv('SLACK_API_URL', 'https://slack.com/api').rstrip('/')
+# Slack allows about one message per second per channel
+SLACK_MESSAGES_PER_SECOND = float(os.getenv('SLACK_MESSAGES_PER_SECOND', '1'))
 
 # Discord Configuration
 DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 DISCORD_CHANNEL = os.getenv('DISCORD_CHANNEL')
+DISCORD_API_URL = os.getenv('DISCORD_API_URL', 'https://discord.com/api/v10').rstrip('/')
+# Discord allows five messages per five seconds per channel
+DISCORD_MESSAGES_PER_SECOND = float(os.getenv('DISCORD_MESSAGES_PER_SECOND', '1'))
+
+# Notification Configuration
+# Job events arriving within this many seconds of each other go out as one digest
+NOTIFY_DIGEST_WINDOW = float(os.getenv('NOTIFY_DIGEST_WINDOW', '10'))
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
+# Events waiting per channel; beyond this new events are dropped rather than block a job
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', '1000'))
 
 # Webhook Configuration
 WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
 
+# Job Queue Configuration
+MAX_IN_FLIGHT_JOBS = int(os.getenv('MAX_IN_FLIGHT_JOBS', '4'))
+MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', '20'))
+OVERLOAD_POLICY = os.getenv('OVERLOAD_POLICY', 'reject')  # or 'defer'
+MAX_DEFERRED_JOBS = int(os.getenv('MAX_DEFERRED_JOBS', '500'))
+WEBHOOK_RETRY_AFTER = int(os.getenv('WEBHOOK_RETRY_AFTER', '30'))
+# Journal of job steps, so an interrupted job resumes where it stopped
+JOB_JOURNAL_PATH = os.getenv('JOB_JOURNAL_PATH', '.jobs/journal.db')
+# 'inline' runs jobs in the server process; 'external' only queues them for worker.py processes
+WORKER_MODE = os.getenv('WORKER_MODE', 'inline')
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '120'))
+WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', '2'))
+
+# Load Testing Configuration
+# Directory to record webhook deliveries to for load_test.py; empty disables recording
+CASSETTE_DIR = os.getenv('CASSETTE_DIR', '')
+
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
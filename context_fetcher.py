@@ -0,0 +1,204 @@
+import re
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from docs_loader import select_docs
+from github_graphql import GraphQLClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CODE_REF_PATTERN = re.compile(r'`([^`]+)`')
+# Fetched when no tree listing is available to choose docs from
+DOC_FILES = ['README.md', 'CONTRIBUTING.md']
+MAX_CODE_REFS = 20
+MAX_RELATED_ISSUES = 100
+
+REPOSITORY_FIELDS = """
+    description
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+    defaultBranchRef { name }
+"""
+
+ISSUE_FIELDS = """
+    issue(number: $number) {
+      title
+      body
+      state
+      createdAt
+      updatedAt
+      labels(first: 50) { nodes { name } }
+    }
+"""
+
+REPOSITORY_QUERY = f"""
+query($owner: String!, $name: String!) {{
+  repository(owner: $owner, name: $name) {{ {REPOSITORY_FIELDS} }}
+}}
+"""
+
+ISSUE_QUERY = f"""
+query($owner: String!, $name: String!, $number: Int!) {{
+  repository(owner: $owner, name: $name) {{ {ISSUE_FIELDS} }}
+}}
+"""
+
+ISSUE_AND_REPOSITORY_QUERY = f"""
+query($owner: String!, $name: String!, $number: Int!) {{
+  repository(owner: $owner, name: $name) {{ {REPOSITORY_FIELDS} {ISSUE_FIELDS} }}
+}}
+"""
+
+
+def to_isoformat(timestamp: str) -> str:
+    """Convert a GraphQL timestamp to the isoformat() string PyGithub datetimes produce."""
+    return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).isoformat()
+
+
+class GraphQLContextFetcher:
+    """
+    Gather the issue_data dict for IssueParser in two GraphQL queries.
+
+    The first query fetches the issue and repository metadata. The second
+    fetches related issues (sharing any label) and the referenced files and
+    docs as blobs. Only fields used to build the prompt are selected, so the
+    repository_info section carries description, topics and default branch
+    but not contributors or recent commits.
+    """
+
+    def __init__(self, client: GraphQLClient):
+        self.client = client
+
+    @staticmethod
+    def _repository_info(repository: Dict) -> Dict:
+        return {
+            'description': repository['description'],
+            'topics': [node['topic']['name'] for node in repository['repositoryTopics']['nodes']],
+            'default_branch': (repository['defaultBranchRef'] or {}).get('name'),
+        }
+
+    def fetch_repository_info(self, repo_name: str) -> Dict:
+        """Fetch only the repository metadata used in the prompt."""
+        owner, name = repo_name.split('/')
+        repository = self.client.execute(REPOSITORY_QUERY, {'owner': owner, 'name': name})['repository']
+        return self._repository_info(repository)
+
+    def fetch(self, repo_name: str, issue_number: int, repository_info: Optional[Dict] = None,
+              issue_info: Optional[Dict] = None, doc_entries: Optional[List[Dict]] = None) -> Dict:
+        """
+        Fetch the issue_data dict.
+
+        If repository_info (e.g. cached) or issue_info (e.g. from a webhook
+        payload) is already known it is used as is, and the first query only
+        asks for what is missing. With both known, it is skipped entirely.
+        doc_entries lists the repository's documentation files (see
+        docs_loader.doc_entries); the ones relevant to the issue are fetched
+        by blob SHA. Without it, README.md and CONTRIBUTING.md are fetched.
+        """
+        owner, name = repo_name.split('/')
+        if issue_info is None or repository_info is None:
+            if issue_info is not None:
+                query = REPOSITORY_QUERY
+            elif repository_info is not None:
+                query = ISSUE_QUERY
+            else:
+                query = ISSUE_AND_REPOSITORY_QUERY
+            variables = {'owner': owner, 'name': name}
+            if issue_info is None:
+                variables['number'] = issue_number
+            repository = self.client.execute(query, variables)['repository']
+
+            if issue_info is None:
+                issue = repository['issue']
+                if issue is None:
+                    raise ValueError(f"Issue #{issue_number} not found in {repo_name}")
+                issue_info = {
+                    'title': issue['title'],
+                    'body': issue['body'],
+                    'labels': [label['name'] for label in issue['labels']['nodes']],
+                    'state': issue['state'].lower(),
+                    'created_at': to_isoformat(issue['createdAt']),
+                    'updated_at': to_isoformat(issue['updatedAt']),
+                }
+            if repository_info is None:
+                repository_info = self._repository_info(repository)
+
+        related_issues, code_context, documentation = self._fetch_related_and_files(
+            owner, name, issue_number, issue_info, doc_entries
+        )
+
+        return {
+            'issue': issue_info,
+            'context': {
+                'related_issues': related_issues,
+                'repository_info': repository_info,
+                'code_context': code_context,
+                'documentation': documentation,
+            }
+        }
+
+    def _fetch_related_and_files(self, owner: str, name: str, issue_number: int, issue_info: Dict,
+                                 doc_entries: Optional[List[Dict]] = None) -> Tuple[List[Dict], Dict, Dict]:
+        """Fetch related issues, referenced files and docs in a single aliased query."""
+        labels = issue_info['labels']
+        body = issue_info['body'] or ''
+        code_refs = list(dict.fromkeys(CODE_REF_PATTERN.findall(body)))[:MAX_CODE_REFS]
+        paths = code_refs + (DOC_FILES if doc_entries is None else [])
+
+        declarations = ['$owner: String!', '$name: String!']
+        fields = []
+        variables: Dict[str, Optional[object]] = {'owner': owner, 'name': name}
+
+        if labels:
+            declarations.append('$labels: [String!]')
+            variables['labels'] = labels
+            fields.append(
+                f'related: issues(first: {MAX_RELATED_ISSUES}, labels: $labels, '
+                'orderBy: {field: UPDATED_AT, direction: DESC}) { nodes { number title state url } }'
+            )
+
+        for i, path in enumerate(paths):
+            declarations.append(f'$path{i}: String!')
+            variables[f'path{i}'] = f'HEAD:{path}'
+            fields.append(f'file{i}: object(expression: $path{i}) {{ ... on Blob {{ oid text isBinary }} }}')
+
+        chosen_docs = select_docs(doc_entries, f"{issue_info['title']}\n{body}") if doc_entries else []
+        for i, entry in enumerate(chosen_docs):
+            declarations.append(f'$doc{i}: GitObjectID!')
+            variables[f'doc{i}'] = entry['sha']
+            fields.append(f'doc{i}: object(oid: $doc{i}) {{ ... on Blob {{ text isBinary }} }}')
+
+        if not fields:
+            return [], {}, {}
+        query = f"query({', '.join(declarations)}) {{ repository(owner: $owner, name: $name) {{ {' '.join(fields)} }} }}"
+        repository = self.client.execute(query, variables)['repository']
+
+        related_issues = [
+            {
+                'number': node['number'],
+                'title': node['title'],
+                'state': node['state'].lower(),
+                'url': node['url']
+            }
+            for node in (repository.get('related') or {}).get('nodes', [])
+            if node['number'] != issue_number
+        ]
+
+        code_context = {}
+        documentation = {}
+        for i, path in enumerate(paths):
+            blob = repository.get(f'file{i}') or {}
+            if blob.get('text') is None or blob.get('isBinary'):
+                continue
+            if i < len(code_refs):
+                code_context[path] = {'content': blob['text'], 'path': path, 'sha': blob['oid']}
+            else:
+                documentation[path] = blob['text']
+        for i, entry in enumerate(chosen_docs):
+            blob = repository.get(f'doc{i}') or {}
+            if blob.get('text') is not None and not blob.get('isBinary'):
+                documentation[entry['path']] = blob['text']
+
+        return related_issues, code_context, documentation
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 """
 Script to delete all branches except main/master.
+
+The --gc mode instead only collects bot branches (BRANCH_PREFIX and
+issue- prefixed) whose pull requests are merged or closed, or that are
+older than a threshold. Branch and PR state are enumerated in a few
+GraphQL pages and deletions run concurrently under a shared rate limiter.
 """
 
 import os
 import logging
-from github import Github
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from config import BRANCH_PREFIX, GC_BATCH_SIZE, GC_WORKERS, GC_MAX_AGE_DAYS
+from http_client import get_github
+from github_graphql import GraphQLClient, delete_ref_operation, run_mutations
+from rate_limiter import RateLimiter
 
 # Configure logging
 logging.basicConfig(
@@ -32,7 +43,7 @@ def delete_branches():
             return
 
         # Initialize GitHub client
-        g = Github(github_token)
+        g = get_github(github_token)
         repo = g.get_repo(repository)
 
         # Get all branches
@@ -57,5 +68,124 @@ def delete_branches():
     except Exception as e:
         logger.error(f"Error in delete_branches: {str(e)}")
 
+BRANCHES_QUERY = """
+query($owner: String!, $name: String!, $query: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef { name }
+    refs(refPrefix: "refs/heads/", query: $query, first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        id
+        name
+        target { ... on Commit { committedDate } }
+        associatedPullRequests(first: 10) { nodes { state } }
+      }
+    }
+  }
+}
+"""
+
+def _list_prefixed_branches(client: GraphQLClient, owner: str, name: str, prefixes: List[str]) -> Tuple[Optional[str], List[Dict]]:
+    """Enumerate branches starting with any of the prefixes, with their PR states and last commit date."""
+    branches = {}
+    default_branch = None
+    for prefix in prefixes:
+        variables = {'owner': owner, 'name': name, 'query': prefix, 'cursor': None}
+        while True:
+            repository = client.execute(BRANCHES_QUERY, variables)['repository']
+            default_branch = (repository.get('defaultBranchRef') or {}).get('name')
+            refs = repository['refs']
+            for node in refs['nodes']:
+                # The refs query is a substring match, so re-check the prefix
+                if node['name'].startswith(prefix):
+                    branches[node['name']] = node
+            if not refs['pageInfo']['hasNextPage']:
+                break
+            variables['cursor'] = refs['pageInfo']['endCursor']
+    return default_branch, list(branches.values())
+
+def _is_collectable(branch: Dict, cutoff: Optional[datetime]) -> Optional[str]:
+    """Return why a branch can be collected, or None if it must be kept."""
+    states = {pr['state'] for pr in branch['associatedPullRequests']['nodes']}
+    if 'OPEN' in states:
+        return None
+    if 'MERGED' in states:
+        return 'PR merged'
+    if 'CLOSED' in states:
+        return 'PR closed'
+
+    committed_date = (branch.get('target') or {}).get('committedDate')
+    if cutoff and committed_date:
+        committed_at = datetime.strptime(committed_date, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        if committed_at < cutoff:
+            return f"last commit {committed_date}"
+    return None
+
+def collect_branches(prefixes: Optional[List[str]] = None, max_age_days: Optional[float] = None,
+                     dry_run: bool = False, batch_size: int = GC_BATCH_SIZE, workers: int = GC_WORKERS) -> None:
+    """Delete stale bot branches whose PRs are finished or whose last commit is older than max_age_days."""
+    try:
+        # Load environment variables
+        load_dotenv()
+        github_token = os.getenv('GITHUB_TOKEN')
+        repository = os.getenv('REPOSITORY')
+
+        if not github_token or not repository:
+            logger.error("Missing required environment variables")
+            return
+
+        owner, name = repository.split('/')
+        prefixes = prefixes or [BRANCH_PREFIX, 'issue-']
+        limiter = RateLimiter()
+        client = GraphQLClient(github_token, limiter)
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days) if max_age_days is not None else None
+
+        default_branch, branches = _list_prefixed_branches(client, owner, name, prefixes)
+        protected_branches = {'main', 'master', default_branch}
+        logger.info(f"Found {len(branches)} branches matching {', '.join(prefixes)}")
+
+        operations = []
+        for branch in branches:
+            if branch['name'] in protected_branches:
+                continue
+            reason = _is_collectable(branch, cutoff)
+            if not reason:
+                continue
+            if dry_run:
+                logger.info(f"[dry run] Would delete branch {branch['name']} ({reason})")
+            else:
+                operations.append(delete_ref_operation(repository, branch['name'], branch['id']))
+
+        if dry_run:
+            return
+
+        deleted = run_mutations(client, operations, batch_size, workers)
+        logger.info(f"Finished branch GC: deleted {deleted}/{len(operations)} branches")
+
+    except Exception as e:
+        logger.error(f"Error in collect_branches: {str(e)}")
+
 if __name__ == "__main__":
-    delete_branches() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Delete branches from the repository.')
+    parser.add_argument('--gc', action='store_true', help='Only delete stale bot branches instead of all non-default branches')
+    parser.add_argument('--prefix', action='append', dest='prefixes',
+                        help=f'Branch prefix to collect; may be repeated (default: {BRANCH_PREFIX} and issue-)')
+    parser.add_argument('--max-age-days', type=float, default=GC_MAX_AGE_DAYS,
+                        help='Also collect branches without a PR whose last commit is older than this')
+    parser.add_argument('--dry-run', action='store_true', help='Only log what would be deleted (GC mode)')
+    parser.add_argument('--batch-size', type=int, default=GC_BATCH_SIZE, help='Deletions per GraphQL request')
+    parser.add_argument('--workers', type=int, default=GC_WORKERS, help='Concurrent GraphQL requests')
+    args = parser.parse_args()
+
+    if args.gc:
+        collect_branches(
+            prefixes=args.prefixes,
+            max_age_days=args.max_age_days,
+            dry_run=args.dry_run,
+            batch_size=args.batch_size,
+            workers=args.workers
+        )
+    elif args.dry_run or args.prefixes:
+        parser.error("--dry-run and --prefix require --gc")
+    else:
+        delete_branches() 
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import logging
+from typing import Dict, Iterable, List
+
+from code_symbols import identifiers
+from config import DOCS_MAX_FILE_BYTES, DOCS_MAX_FETCH_BYTES, DOCS_MAX_PROMPT_CHARS, DOCS_MAX_FILES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOC_EXTENSIONS = {'.md', '.markdown', '.rst', '.txt', '.adoc'}
+DOC_DIRECTORIES = ('docs/', 'doc/')
+# Top-level files always offered first, in this order
+ROOT_DOCS = ('readme', 'contributing')
+
+# Regular (non-executable or executable) files; symlinks and submodules are skipped
+FILE_MODES = {'100644', '100755'}
+
+
+def is_doc_path(path: str) -> bool:
+    """Whether path is a documentation file the loader would consider."""
+    base, extension = os.path.splitext(path.lower())
+    if extension not in DOC_EXTENSIONS and not (extension == '' and base in ROOT_DOCS):
+        return False
+    return '/' not in path or path.lower().startswith(DOC_DIRECTORIES)
+
+
+def doc_entries(tree: Iterable) -> List[Dict]:
+    """
+    Pick the documentation files out of a recursive tree listing.
+
+    Uses only the listing's metadata, so binaries, links and files over
+    DOCS_MAX_FILE_BYTES are skipped without downloading anything. Returns
+    dicts with path, sha and size.
+    """
+    entries = []
+    for element in tree:
+        if element.type != 'blob' or element.mode not in FILE_MODES or not is_doc_path(element.path):
+            continue
+        if (element.size or 0) > DOCS_MAX_FILE_BYTES:
+            logger.info(f"Skipping oversized doc {element.path} ({element.size} bytes)")
+            continue
+        entries.append({'path': element.path, 'sha': element.sha, 'size': element.size or 0})
+    return entries
+
+
+def _root_rank(path: str) -> int:
+    base = os.path.splitext(path.lower())[0]
+    return ROOT_DOCS.index(base) if '/' not in path and base in ROOT_DOCS else len(ROOT_DOCS)
+
+
+def select_docs(entries: List[Dict], issue_text: str) -> List[Dict]:
+    """
+    Choose which docs to download, within DOCS_MAX_FILES and DOCS_MAX_FETCH_BYTES.
+
+    README and CONTRIBUTING come first. Other docs are chosen only if their
+    path shares words with the issue, most shared words first, then smallest.
+    """
+    words = identifiers(issue_text)
+
+    def path_score(entry: Dict) -> int:
+        return len(words & identifiers(entry['path'].replace('/', ' ').replace('.', ' ').replace('-', '_')))
+
+    candidates = [entry for entry in entries if _root_rank(entry['path']) < len(ROOT_DOCS) or path_score(entry) > 0]
+    candidates.sort(key=lambda entry: (_root_rank(entry['path']), -path_score(entry), entry['size']))
+
+    chosen = []
+    budget = DOCS_MAX_FETCH_BYTES
+    for entry in candidates:
+        if len(chosen) >= DOCS_MAX_FILES:
+            break
+        if entry['size'] > budget:
+            continue
+        chosen.append(entry)
+        budget -= entry['size']
+    return chosen
+
+
+def rank_documents(documents: Dict[str, str], issue_text: str) -> Dict[str, str]:
+    """
+    Order fetched docs by how many of the issue's words they use and cut them to DOCS_MAX_PROMPT_CHARS.
+
+    The README keeps its place at the front; the doc that crosses the limit
+    is truncated and the rest are left out.
+    """
+    words = identifiers(issue_text)
+    ranked = sorted(
+        documents.items(),
+        key=lambda item: (_root_rank(item[0]) != 0, -len(words & identifiers(item[1])))
+    )
+
+    selected = {}
+    budget = DOCS_MAX_PROMPT_CHARS
+    for path, text in ranked:
+        if budget <= 0:
+            break
+        if len(text) > budget:
+            text = text[:budget] + '\n[... truncated]'
+        selected[path] = text
+        budget -= len(text)
+    return selected
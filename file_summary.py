@@ -0,0 +1,156 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from cache import LRUCache
+from code_symbols import extract_symbols, identifiers
+from config import MAX_FILE_CONTEXT_CHARS, SUMMARY_MODE, SUMMARY_MODEL, SUMMARY_CACHE_SIZE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Lines per chunk in the map step of an LLM summary
+SUMMARY_CHUNK_LINES = 150
+SUMMARY_WORKERS = 4
+
+
+def git_blob_sha(content: str) -> str:
+    """Compute the git blob SHA of content, as GitHub reports it."""
+    data = content.encode()
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class FileSummarizer:
+    """
+    Render files for the prompt, summarizing those that are too large.
+
+    A large file is replaced by its outline (symbols, signatures and first
+    docstring lines) and, in 'llm' mode, a map-reduce summary: each chunk is
+    summarized separately and the partial summaries are then combined. Only
+    the functions and classes named in the issue are included in full.
+    Summaries are cached by blob SHA, so they are reused across issues
+    until the file changes.
+    """
+
+    def __init__(self, client=None, mode: str = SUMMARY_MODE, model: str = SUMMARY_MODEL,
+                 max_chars: int = MAX_FILE_CONTEXT_CHARS, cache_size: int = SUMMARY_CACHE_SIZE):
+        self.client = client
+        self.mode = mode if client is not None else 'structural'
+        self.model = model
+        self.max_chars = max_chars
+        self.cache = LRUCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix='summary')
+
+    def render(self, path: str, content: str, sha: Optional[str], issue_text: str) -> str:
+        """Return content as is if it is small enough, else its summary and the regions issue_text refers to."""
+        if len(content) <= self.max_chars:
+            return content
+
+        key = (sha or git_blob_sha(content), self.mode)
+        try:
+            summary = self.cache.get(key, lambda: self._summarize(path, content))
+        except Exception as e:
+            # Not cached, so the next issue touching this file tries the full summary again
+            logger.error(f"Error summarizing {path}, using its outline only: {str(e)}")
+            summary = self._outline_summary(path, content)
+
+        lines = content.splitlines()
+        regions = self._relevant_regions(summary['symbols'], lines, issue_text)
+        parts = [f"[Large file: {len(lines)} lines. Shown as a summary, with the regions relevant to the issue in full]"]
+        if summary['text']:
+            parts.append(f"Summary:\n{summary['text']}")
+        parts.append(f"Outline:\n{summary['outline']}")
+        for start, end in regions:
+            parts.append(f"Lines {start}-{end}:\n" + '\n'.join(lines[start - 1:end]))
+        return '\n\n'.join(parts)
+
+    def _summarize(self, path: str, content: str) -> Dict:
+        summary = self._outline_summary(path, content)
+        if self.mode == 'llm':
+            summary['text'] = self._llm_summary(path, content)
+        return summary
+
+    def _outline_summary(self, path: str, content: str) -> Dict:
+        """Build the structural summary: symbols and their one-line outline."""
+        symbols = extract_symbols(path, content)
+        outline = []
+        size = 0
+        for symbol in symbols:
+            line = f"L{symbol['start']}-{symbol['end']}: {symbol['signature']}"
+            if symbol['doc']:
+                line += f"  # {symbol['doc']}"
+            size += len(line) + 1
+            if size > self.max_chars // 2:
+                outline.append(f"... {len(symbols) - len(outline)} more definitions")
+                break
+            outline.append(line)
+        return {
+            'symbols': symbols,
+            'outline': '\n'.join(outline) or 'No definitions found.',
+            'text': '',
+        }
+
+    def _llm_summary(self, path: str, content: str) -> str:
+        """Summarize each chunk of the file concurrently, then combine the partial summaries."""
+        lines = content.splitlines()
+        chunks = [
+            (start + 1, min(start + SUMMARY_CHUNK_LINES, len(lines)))
+            for start in range(0, len(lines), SUMMARY_CHUNK_LINES)
+        ]
+        partials = list(self.executor.map(
+            lambda chunk: self._complete(
+                f"Summarize lines {chunk[0]}-{chunk[1]} of {path} in at most 5 bullet points, "
+                f"naming the key functions and classes and what they do.\n\n"
+                + '\n'.join(lines[chunk[0] - 1:chunk[1]]),
+                300
+            ),
+            chunks
+        ))
+        if len(partials) == 1:
+            return partials[0]
+        return self._complete(
+            f"Combine these summaries of consecutive parts of {path} into one summary of the whole "
+            f"file in at most 15 bullet points.\n\n" + '\n\n'.join(partials),
+            500
+        )
+
+    def _complete(self, prompt: str, max_tokens: int) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You summarize source code for another developer."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            max_tokens=max_tokens
+        )
+        return (response.choices[0].message.content or '').strip()
+
+    def _relevant_regions(self, symbols: List[Dict], lines: List[str], issue_text: str) -> List[Tuple[int, int]]:
+        """
+        Pick the line ranges of symbols named in the issue, within the size budget.
+
+        Functions are preferred to whole classes, and a symbol inside an
+        already chosen region is not repeated.
+        """
+        words = identifiers(issue_text)
+        matches = [
+            symbol for symbol in symbols
+            if symbol['name'].rsplit('.', 1)[-1].lower() in words
+        ]
+        matches.sort(key=lambda symbol: (symbol['kind'] == 'class', symbol['end'] - symbol['start']))
+
+        regions = []
+        budget = self.max_chars
+        for symbol in matches:
+            start, end = symbol['start'], symbol['end']
+            if any(start >= chosen[0] and end <= chosen[1] for chosen in regions):
+                continue
+            cost = sum(len(line) + 1 for line in lines[start - 1:end])
+            if cost > budget:
+                continue
+            regions.append((start, end))
+            budget -= cost
+        return sorted(regions)
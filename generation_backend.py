@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+import openai
+
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, LOCAL_BACKEND_URL, LOCAL_BACKEND_API_KEY, LOCAL_BACKEND_CONTEXT,
+    LOCAL_BACKEND_N_CANDIDATES, LOCAL_BACKEND_TIMEOUT
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Context windows of OpenAI models, in tokens; longest matching prefix wins
+OPENAI_CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo': 4096,
+    'gpt-3.5-turbo-16k': 16385,
+    'gpt-3.5-turbo-1106': 16385,
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-1106-preview': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+
+class GenerationBackend:
+    """
+    A model server that turns chat messages into completions.
+
+    Subclasses implement complete(); acomplete() and stream() fall back to
+    it. capabilities declares what the server supports:
+
+    - 'max_context_tokens': context window when context_window() knows no better
+    - 'streaming': whether stream() yields output as it is generated
+    - 'n_candidates': whether one request can return several choices (n > 1)
+    """
+
+    name = 'base'
+    capabilities: Dict = {'max_context_tokens': DEFAULT_CONTEXT_WINDOW, 'streaming': False, 'n_candidates': False}
+
+    def complete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                 n: int = 1) -> List[str]:
+        """Return the content of each of the n choices."""
+        raise NotImplementedError
+
+    async def acomplete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                        n: int = 1) -> List[str]:
+        """complete() for asyncio callers; runs the blocking call on the default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.complete(messages, model, max_tokens, temperature, n))
+
+    def stream(self, messages: List[Dict], model: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        """Yield the completion in pieces as it is generated."""
+        yield from self.complete(messages, model, max_tokens, temperature, 1)
+
+    def context_window(self, model: str) -> int:
+        return self.capabilities['max_context_tokens']
+
+
+class OpenAIBackend(GenerationBackend):
+    """Chat completions on the OpenAI API, or whatever OPENAI_BASE_URL points at."""
+
+    name = 'openai'
+    capabilities = {'max_context_tokens': DEFAULT_CONTEXT_WINDOW, 'streaming': True, 'n_candidates': True}
+
+    def __init__(self, client: Optional[openai.OpenAI] = None):
+        self.client = client or openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        # Same key, server and timeout as the sync client, so LocalBackend's timeout applies to async calls too
+        self.async_client = openai.AsyncOpenAI(
+            api_key=self.client.api_key, base_url=self.client.base_url, timeout=self.client.timeout
+        )
+
+    def complete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                 n: int = 1) -> List[str]:
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, n=n
+        )
+        return [choice.message.content or '' for choice in response.choices]
+
+    async def acomplete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                        n: int = 1) -> List[str]:
+        response = await self.async_client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, n=n
+        )
+        return [choice.message.content or '' for choice in response.choices]
+
+    def stream(self, messages: List[Dict], model: str, max_tokens: int, temperature: float) -> Iterator[str]:
+        chunks = self.client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, stream=True
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def context_window(self, model: str) -> int:
+        matches = [prefix for prefix in OPENAI_CONTEXT_WINDOWS if model.startswith(prefix)]
+        if not matches:
+            return self.capabilities['max_context_tokens']
+        return OPENAI_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+class LocalBackend(OpenAIBackend):
+    """
+    A self-hosted model behind an OpenAI-compatible server on this machine.
+
+    Works with servers that implement /v1/chat/completions, such as vLLM,
+    llama.cpp's server or Ollama. Most of them ignore n, so unless
+    LOCAL_BACKEND_N_CANDIDATES is set candidates are requested one by one.
+    """
+
+    name = 'local'
+    capabilities = {
+        'max_context_tokens': LOCAL_BACKEND_CONTEXT,
+        'streaming': True,
+        'n_candidates': LOCAL_BACKEND_N_CANDIDATES,
+    }
+
+    def __init__(self):
+        # Local servers usually accept any key, but the client requires one
+        super().__init__(openai.OpenAI(
+            api_key=LOCAL_BACKEND_API_KEY or 'local', base_url=LOCAL_BACKEND_URL, timeout=LOCAL_BACKEND_TIMEOUT
+        ))
+
+    def context_window(self, model: str) -> int:
+        return self.capabilities['max_context_tokens']
+
+
+_factories: Dict[str, Callable[[], GenerationBackend]] = {
+    'openai': OpenAIBackend,
+    'local': LocalBackend,
+}
+# Earlier name of the OpenAI backend, still accepted in AI_ENGINE
+_aliases = {'gpt4': 'openai'}
+_backends: Dict[str, GenerationBackend] = {}
+_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[], GenerationBackend]) -> None:
+    """Make a backend available to MODEL_TIERS and AI_ENGINE under name."""
+    with _lock:
+        _factories[name] = factory
+        _backends.pop(name, None)
+
+
+def backend_name(name: str) -> str:
+    return _aliases.get(name, name)
+
+
+def get_backend(name: str) -> GenerationBackend:
+    """Return the shared instance of a registered backend, creating it on first use."""
+    name = backend_name(name)
+    with _lock:
+        backend = _backends.get(name)
+        if backend is None:
+            if name not in _factories:
+                raise ValueError(f"Unsupported generation backend: {name}")
+            backend = _factories[name]()
+            _backends[name] = backend
+            logger.info(f"Initialized {name} generation backend")
+        return backend
@@ -0,0 +1,126 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from config import GITHUB_TOKEN, GITHUB_API_URL
+from http_client import get_session, github_headers
+from rate_limiter import RateLimiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GRAPHQL_URL = f'{GITHUB_API_URL}/graphql'
+
+
+class GraphQLError(Exception):
+    """Raised when a GraphQL request returns errors."""
+
+    def __init__(self, errors: List[Dict]):
+        self.errors = errors
+        super().__init__('; '.join(error.get('message', str(error)) for error in errors))
+
+
+class GraphQLClient:
+    """Minimal GitHub GraphQL client on top of the shared HTTP session."""
+
+    def __init__(self, github_token: Optional[str] = None, limiter: Optional[RateLimiter] = None):
+        self.token = github_token or GITHUB_TOKEN
+        self.limiter = limiter
+
+    def execute_partial(self, query: str, variables: Optional[Dict] = None) -> Tuple[Dict, List[Dict]]:
+        """Run a query and return (data, errors) without raising on field-level errors."""
+        if self.limiter:
+            self.limiter.acquire()
+        try:
+            response = get_session().post(
+                GRAPHQL_URL,
+                json={'query': query, 'variables': variables or {}},
+                headers={'Authorization': f"bearer {self.token}"}
+            )
+            if self.limiter:
+                self.limiter.observe(response.headers)
+            response.raise_for_status()
+            payload = response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error executing GraphQL request: {str(e)}")
+            raise
+        return payload.get('data') or {}, payload.get('errors') or []
+
+    def execute(self, query: str, variables: Optional[Dict] = None) -> Dict:
+        """Run a query and return its data, raising GraphQLError on any error."""
+        data, errors = self.execute_partial(query, variables)
+        if errors:
+            raise GraphQLError(errors)
+        return data
+
+
+def rest_call(client: GraphQLClient, method: str, url: str, **kwargs) -> None:
+    """
+    Send a REST request as client's token, under its rate limiter.
+
+    Used when a GraphQL mutation fails, so the fallback acts as the same
+    identity as the mutation would have.
+    """
+    if client.limiter:
+        client.limiter.acquire()
+    response = get_session().request(method, url, headers=github_headers(client.token), **kwargs)
+    if client.limiter:
+        client.limiter.observe(response.headers)
+    response.raise_for_status()
+
+
+def delete_ref_operation(repository: str, branch_name: str, ref_id: str) -> Dict:
+    """Build a batched-mutation operation that deletes a branch."""
+    url = f"{GITHUB_API_URL}/repos/{repository}/git/refs/heads/{branch_name}"
+    return {
+        'mutation': f"deleteRef(input: {{refId: {json.dumps(ref_id)}}}) {{ clientMutationId }}",
+        'description': f"delete branch {branch_name}",
+        'fallback': lambda client: rest_call(client, 'DELETE', url)
+    }
+
+
+def _run_batch(client: GraphQLClient, operations: List[Dict]) -> int:
+    """
+    Apply a batch of operations in a single aliased GraphQL mutation.
+
+    Each operation is a dict with the mutation field text, a description for
+    logging and a fallback callable taking the client. Operations whose
+    mutation fails are retried one by one through their fallback. Returns the number of
+    operations that succeeded.
+    """
+    mutation = 'mutation { ' + ' '.join(
+        f"op{i}: {operation['mutation']}" for i, operation in enumerate(operations)
+    ) + ' }'
+    try:
+        _, errors = client.execute_partial(mutation)
+        failed = {error['path'][0] for error in errors if error.get('path')}
+        if errors and not failed:
+            failed = {f'op{i}' for i in range(len(operations))}
+    except requests.exceptions.RequestException:
+        failed = {f'op{i}' for i in range(len(operations))}
+
+    succeeded = 0
+    for i, operation in enumerate(operations):
+        if f'op{i}' in failed:
+            try:
+                operation['fallback'](client)
+            except Exception as e:
+                logger.error(f"Error on {operation['description']}: {str(e)}")
+                continue
+        logger.info(f"Done: {operation['description']}")
+        succeeded += 1
+    return succeeded
+
+
+def run_mutations(client: GraphQLClient, operations: List[Dict], batch_size: int, workers: int) -> int:
+    """Split operations into batches and run them concurrently, returning how many succeeded."""
+    batches = [operations[i:i + batch_size] for i in range(0, len(operations), batch_size)]
+    succeeded = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in as_completed(executor.submit(_run_batch, client, batch) for batch in batches):
+            succeeded += future.result()
+    return succeeded
@@ -1,19 +1,26 @@
-from github import Github, InputGitTreeElement
+from github import InputGitTreeElement
 from github.GithubException import GithubException
 import logging
-from config import GITHUB_TOKEN, REPOSITORY, BRANCH_PREFIX
+from config import GITHUB_TOKEN, REPOSITORY, BRANCH_PREFIX, RERUN_BRANCH_MODE
+from http_client import get_github
+from patch_applier import apply_edits
+from issue_writeback import IssueWriteBack
 from github.Repository import Repository
 from github.Issue import Issue
 from github.PullRequest import PullRequest
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def issue_branch_name(issue_number: int) -> str:
+    """The bot's branch for an issue; reruns for the issue reuse it."""
+    return f"{BRANCH_PREFIX}{issue_number}"
+
 class GitHubHandler:
     def __init__(self, github_token: str):
-        self.github = Github(github_token)
+        self.github = get_github(github_token)
         logger.info("Initialized GitHub handler")
 
     def get_issue(self, issue_number):
@@ -26,7 +33,7 @@ class GitHubHandler:
 
     def create_branch(self, issue_number):
         """Create a new branch for the issue."""
-        branch_name = f"{BRANCH_PREFIX}{issue_number}"
+        branch_name = issue_branch_name(issue_number)
         try:
             # Get the default branch (usually main or master)
             default_branch = self.repo.default_branch
@@ -113,54 +120,31 @@ class GitHubHandler:
             logger.error(f"Error creating commit: {str(e)}")
             raise
 
-    def create_pr(self, repo_name: str, issue_number: int, title: str, body: str, changes: Dict) -> str:
-        """Create a pull request with the given changes."""
+    def create_pr(self, repo_name: str, issue_number: int, title: str, body: str, changes: Dict,
+                  edit_format: str = 'whole', writeback: Optional[IssueWriteBack] = None) -> str:
+        """
+        Create a pull request with the given changes, or update the issue's open one.
+
+        With edit_format='whole' each value in changes is the file's new
+        content. With edit_format='diff' it is a set of SEARCH/REPLACE edits
+        or a unified diff, applied against the file on the base branch.
+        With a writeback the PR link is buffered in it for the caller to
+        flush with its other updates; otherwise it is commented right away.
+        """
         try:
             repo = self.github.get_repo(repo_name)
-            issue = repo.get_issue(number=issue_number)
 
-            # Create a new branch
-            branch_name = f"issue-{issue_number}"
-            base_branch = repo.default_branch
-            ref = repo.get_git_ref(f"heads/{base_branch}")
-            repo.create_git_ref(f"refs/heads/{branch_name}", ref.object.sha)
-
-            # Apply changes
-            for file_path, content in changes.items():
-                try:
-                    # Try to get the file if it exists
-                    try:
-                        file = repo.get_contents(file_path, ref=base_branch)
-                        # Update existing file
-                        repo.update_file(
-                            path=file_path,
-                            message=f"Update {file_path} for issue #{issue_number}",
-                            content=content,
-                            sha=file.sha,
-                            branch=branch_name
-                        )
-                    except:
-                        # Create new file
-                        repo.create_file(
-                            path=file_path,
-                            message=f"Create {file_path} for issue #{issue_number}",
-                            content=content,
-                            branch=branch_name
-                        )
-                except Exception as e:
-                    logger.error(f"Error applying changes to {file_path}: {str(e)}")
-                    raise
-
-            # Create pull request
-            pr = repo.create_pull(
-                title=title,
-                body=body,
-                head=branch_name,
-                base=base_branch
-            )
+            # Commit the changes to the issue's branch, creating it if needed
+            commit = self.commit_changes(repo, issue_number, changes, edit_format)
+
+            # Create pull request, or reuse the one a previous run opened
+            pr = self.open_pull_request(repo, commit['branch'], commit['base'], title, body)
 
-            # Link PR to issue
-            issue.create_comment(f"Linked PR: #{pr.number}")
+            # Link PR to issue, now or along with the caller's other updates
+            pending = writeback or IssueWriteBack(self.github, repo_name, issue_number)
+            pending.comment(f"Linked PR: #{pr.number}")
+            if writeback is None:
+                pending.flush()
 
             return pr.html_url
 
@@ -168,6 +152,105 @@ class GitHubHandler:
             logger.error(f"Error creating PR: {str(e)}")
             raise
 
+    def commit_changes(self, repo: Repository, issue_number: int, changes: Dict, edit_format: str = 'whole',
+                       mode: str = RERUN_BRANCH_MODE) -> Dict:
+        """
+        Commit all changes as one commit on the issue's branch, creating the branch if it does not exist.
+
+        On a rerun the branch already exists. In 'reset' mode the new commit
+        is built on the current base branch and the branch is moved to it, so
+        the PR shows only the latest generation. In 'append' mode it is added
+        on top of the branch. Diff-mode edits are always applied to the base
+        branch's files, which is what the model was shown. If the branch
+        already has exactly these files (a resumed job whose commit went
+        through), nothing is committed.
+
+        Returns the branch, base branch and head commit SHA.
+        """
+        branch_name = issue_branch_name(issue_number)
+        base_branch = repo.default_branch
+        base_sha = repo.get_git_ref(f"heads/{base_branch}").object.sha
+        try:
+            ref = repo.get_git_ref(f"heads/{branch_name}")
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            ref = None
+
+        parent = repo.get_git_commit(ref.object.sha if ref is not None and mode == 'append' else base_sha)
+        modes = self._file_modes(repo, parent.tree.sha, changes)
+        elements = []
+        for file_path, content in changes.items():
+            if edit_format == 'diff':
+                content = apply_edits(self._read_file(repo, file_path, base_sha) or '', content)
+            blob = repo.create_git_blob(content=content, encoding='utf-8')
+            elements.append(InputGitTreeElement(
+                path=file_path, mode=modes.get(file_path, '100644'), type='blob', sha=blob.sha
+            ))
+        tree = repo.create_git_tree(elements, base_tree=parent.tree)
+
+        if ref is not None:
+            head = repo.get_git_commit(ref.object.sha)
+            if head.tree.sha == tree.sha:
+                logger.info(f"{branch_name} already has these changes")
+                return {'branch': branch_name, 'base': base_branch, 'sha': head.sha}
+
+        commit = repo.create_git_commit(
+            message=f"Fix for issue #{issue_number}",
+            tree=tree,
+            parents=[parent]
+        )
+        if ref is None:
+            repo.create_git_ref(f"refs/heads/{branch_name}", commit.sha)
+            logger.info(f"Created branch {branch_name} at {commit.sha}")
+        else:
+            ref.edit(commit.sha, force=(mode != 'append'))
+            logger.info(f"Moved existing branch {branch_name} to {commit.sha} ({mode})")
+        return {'branch': branch_name, 'base': base_branch, 'sha': commit.sha}
+
+    @staticmethod
+    def _read_file(repo: Repository, file_path: str, ref: str) -> Optional[str]:
+        """A file's text at ref, or None if it does not exist there."""
+        try:
+            return repo.get_contents(file_path, ref=ref).decoded_content.decode()
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            return None
+
+    @staticmethod
+    def _file_modes(repo: Repository, tree_sha: str, paths: Iterable[str]) -> Dict[str, str]:
+        """Modes of the existing files among paths, so executables stay executable."""
+        paths = set(paths)
+        try:
+            tree = repo.get_git_tree(tree_sha, recursive=True)
+            return {element.path: element.mode for element in tree.tree if element.path in paths}
+        except GithubException as e:
+            logger.warning(f"Could not read file modes, using 100644: {str(e)}")
+            return {}
+
+    def open_pull_request(self, repo: Repository, branch_name: str, base_branch: str, title: str,
+                          body: str) -> PullRequest:
+        """Open a PR from the branch, or update and return the one already open for it."""
+        for pr in repo.get_pulls(state='open', head=f"{repo.owner.login}:{branch_name}"):
+            logger.info(f"PR #{pr.number} is already open for {branch_name}, updating it")
+            pr.edit(title=title, body=body)
+            return pr
+        try:
+            return repo.create_pull(
+                title=title,
+                body=body,
+                head=branch_name,
+                base=base_branch
+            )
+        except GithubException as e:
+            if e.status != 422:
+                raise
+            # Opened concurrently since the lookup above
+            for pr in repo.get_pulls(state='open', head=f"{repo.owner.login}:{branch_name}"):
+                return pr
+            raise
+
     def update_issue(self, repo_name: str, issue_number: int, comment: str) -> None:
         """Update an issue with a comment."""
         try:
@@ -0,0 +1,89 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from github import Auth, Github
+
+from config import GITHUB_TOKEN, GITHUB_API_URL, HTTP_POOL_SIZE, HTTP_TIMEOUT, HTTP_MAX_RETRIES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_session = None
+_github_clients: Dict[Optional[str], Github] = {}
+
+
+class TimeoutSession(requests.Session):
+    """A requests session that applies a default timeout to every request."""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _build_session() -> requests.Session:
+    """Build a keep-alive session with a sized connection pool and retries."""
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS'])
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry
+    )
+
+    session = TimeoutSession(HTTP_TIMEOUT)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+        'User-Agent': 'issue2pr'
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide HTTP session, creating it on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _build_session()
+            logger.info(f"Initialized shared HTTP session (pool size {HTTP_POOL_SIZE}, timeout {HTTP_TIMEOUT}s)")
+        return _session
+
+
+def github_headers(token: Optional[str] = None) -> Dict[str, str]:
+    """Return the headers used for raw GitHub REST calls."""
+    return {
+        'Authorization': f"token {token or GITHUB_TOKEN}",
+        'Accept': 'application/vnd.github.v3+json'
+    }
+
+
+def get_github(token: Optional[str] = None) -> Github:
+    """Return a shared PyGithub client for the token, reusing its connection pool."""
+    token = token or GITHUB_TOKEN
+    with _lock:
+        client = _github_clients.get(token)
+        if client is None:
+            client = Github(
+                auth=Auth.Token(token) if token else None,
+                base_url=GITHUB_API_URL,
+                timeout=int(HTTP_TIMEOUT),
+                pool_size=HTTP_POOL_SIZE
+            )
+            _github_clients[token] = client
+        return client
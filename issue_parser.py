@@ -1,40 +1,184 @@
+import time
+import base64
+import hashlib
+import posixpath
 import logging
-from typing import Dict, List, Optional
-from github import Github
+import threading
+import requests
+from typing import Dict, List, Optional, Set
 from github.Repository import Repository
-from github.Issue import Issue
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache
+from config import (
+    CONTEXT_FETCHER, REPO_CACHE_TTL, REPO_CACHE_STALE_TTL, ISSUE_CONTEXT_TTL,
+    SYMBOL_INDEX, SYMBOL_INDEX_RESULTS, SYMBOL_INDEX_TTL, MAX_FILE_CONTEXT_CHARS
+)
+from context_fetcher import GraphQLContextFetcher, to_isoformat
+from docs_loader import doc_entries, is_doc_path, rank_documents, select_docs
+from github_graphql import GraphQLClient, GraphQLError
+from http_client import get_github
+from symbol_index import SymbolIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DOCS_FETCH_WORKERS = 4
+
+def fingerprint_issue(issue: Dict) -> str:
+    """Hash the issue fields that the gathered context (and generated code) depend on."""
+    text = f"{issue['title']}\0{issue.get('body') or ''}"
+    return hashlib.sha256(text.encode()).hexdigest()
+
 class IssueParser:
-    def __init__(self, github_token: str):
-        self.github = Github(github_token)
-        self.context_cache = {}
+    def __init__(self, github_token: str, code_context_chars: Optional[int] = None):
+        self.github = get_github(github_token)
+        # Prompt characters the code context may take; indexed files stop being added at this
+        self.code_context_chars = code_context_chars
+        self.graphql_client = GraphQLClient(github_token)
+        self.graphql_fetcher = GraphQLContextFetcher(self.graphql_client)
+        # Repository metadata, keyed by (kind, repo name)
+        self.context_cache = TTLCache(REPO_CACHE_TTL, REPO_CACHE_STALE_TTL)
+        # Parsed issue_data, keyed by (repo name, issue number)
+        self.issue_context_cache = TTLCache(ISSUE_CONTEXT_TTL)
+        # Symbol indexes by repo name, refreshed in the background once older than SYMBOL_INDEX_TTL
+        self.symbol_indexes: Dict[str, SymbolIndex] = {}
+        self.index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='symbol-index')
+        self.index_lock = threading.Lock()
+        self.docs_executor = ThreadPoolExecutor(max_workers=DOCS_FETCH_WORKERS, thread_name_prefix='docs')
+
+    def parse_issue(self, repo_name: str, issue_number: int, prefetched: Optional[Dict] = None) -> Dict:
+        """
+        Parse an issue and gather relevant context.
+
+        prefetched may hold the 'issue' and 'repository' objects of a webhook
+        payload. Fields they carry are used as is; only the rest is fetched.
+        """
+        issue_info = None
+        if prefetched and prefetched.get('issue'):
+            issue_info = self._issue_info_from_payload(prefetched['issue'])
+        if prefetched and prefetched.get('repository'):
+            # The payload is as fresh as it gets, so refresh the cached metadata with it
+            self.context_cache.set(
+                ('graphql_repository_info', repo_name),
+                self._repository_info_from_payload(prefetched['repository'])
+            )
+
+        if issue_info is not None:
+            cached = self._cached_issue_data(repo_name, issue_number, issue_info)
+            if cached is not None:
+                logger.info(f"Using cached context for issue #{issue_number} in {repo_name}")
+                return cached
+
+        issue_data = None
+        if CONTEXT_FETCHER == 'graphql':
+            try:
+                issue_data = self._parse_issue_graphql(repo_name, issue_number, issue_info)
+            except (GraphQLError, requests.exceptions.RequestException) as e:
+                logger.warning(f"GraphQL context fetch failed, falling back to REST: {str(e)}")
+        if issue_data is None:
+            issue_data = self._parse_issue_rest(repo_name, issue_number, issue_info)
+
+        if SYMBOL_INDEX:
+            self._add_indexed_code_context(repo_name, issue_data)
+
+        self.issue_context_cache.set((repo_name, issue_number), {
+            'fingerprint': self._fingerprint(issue_data['issue']),
+            'issue_data': issue_data
+        })
+        return issue_data
+
+    @staticmethod
+    def _fingerprint(issue_info: Dict) -> str:
+        return fingerprint_issue(issue_info)
+
+    def _cached_issue_data(self, repo_name: str, issue_number: int, issue_info: Dict) -> Optional[Dict]:
+        """
+        Return previously gathered issue_data if the issue text is unchanged.
+
+        Timestamps, state and labels may have moved on (a /generate comment
+        bumps updated_at, a trigger label is added), so the cached context is
+        reused with the current issue section.
+        """
+        cached = self.issue_context_cache.peek((repo_name, issue_number))
+        if not cached or cached['fingerprint'] != self._fingerprint(issue_info):
+            return None
+        issue_data = cached['issue_data']
+        if issue_data['issue'] != issue_info:
+            issue_data = {'issue': issue_info, 'context': issue_data['context']}
+        return issue_data
+
+    @staticmethod
+    def _issue_info_from_payload(issue: Dict) -> Dict:
+        """Build the issue section of issue_data from a webhook issue object."""
+        return {
+            'title': issue['title'],
+            'body': issue.get('body'),
+            'labels': [label['name'] for label in issue.get('labels', [])],
+            'state': issue['state'],
+            'created_at': to_isoformat(issue['created_at']),
+            'updated_at': to_isoformat(issue['updated_at']),
+        }
+
+    @staticmethod
+    def _repository_info_from_payload(repository: Dict) -> Dict:
+        """Build the prompt's repository metadata from a webhook repository object."""
+        return {
+            'description': repository.get('description'),
+            'topics': repository.get('topics', []),
+            'default_branch': repository.get('default_branch'),
+        }
+
+    def _parse_issue_graphql(self, repo_name: str, issue_number: int, issue_info: Optional[Dict] = None) -> Dict:
+        """Parse an issue through GraphQL, reusing cached repository metadata."""
+        key = ('graphql_repository_info', repo_name)
+        # Taken before the fetch so an invalidation during it discards the result
+        generation = self.context_cache.generation(key)
+        repository_info = self.context_cache.get(
+            key,
+            lambda: self.graphql_fetcher.fetch_repository_info(repo_name),
+            block=False
+        )
+        issue_data = self.graphql_fetcher.fetch(
+            repo_name, issue_number, repository_info, issue_info, self._doc_entries_or_none(repo_name)
+        )
+        if repository_info is None:
+            # Cold miss: the metadata came back with the issue query
+            self.context_cache.set(key, issue_data['context']['repository_info'], generation)
+        context = issue_data['context']
+        context['documentation'] = rank_documents(context['documentation'], self._issue_text(issue_data['issue']))
+        return issue_data
 
-    def parse_issue(self, repo_name: str, issue_number: int) -> Dict:
-        """Parse an issue and gather relevant context."""
+    @staticmethod
+    def _issue_text(issue_info: Dict) -> str:
+        return f"{issue_info['title']}\n{issue_info['body'] or ''}"
+
+    def _parse_issue_rest(self, repo_name: str, issue_number: int, issue_info: Optional[Dict] = None) -> Dict:
+        """Parse an issue and gather relevant context through the REST API."""
         try:
-            repo = self.github.get_repo(repo_name)
-            issue = repo.get_issue(number=issue_number)
-            
-            # Gather basic issue information
-            issue_info = {
-                'title': issue.title,
-                'body': issue.body,
-                'labels': [label.name for label in issue.labels],
-                'state': issue.state,
-                'created_at': issue.created_at.isoformat(),
-                'updated_at': issue.updated_at.isoformat(),
-            }
+            if issue_info is None:
+                repo = self.github.get_repo(repo_name)
+                issue = repo.get_issue(number=issue_number)
+
+                # Gather basic issue information
+                issue_info = {
+                    'title': issue.title,
+                    'body': issue.body,
+                    'labels': [label.name for label in issue.labels],
+                    'state': issue.state,
+                    'created_at': issue.created_at.isoformat(),
+                    'updated_at': issue.updated_at.isoformat(),
+                }
+            else:
+                # Everything about the issue is known; the repo is only a handle for further calls
+                repo = self.github.get_repo(repo_name, lazy=True)
 
             # Gather additional context
             context = {
-                'related_issues': self._get_related_issues(repo, issue),
-                'repository_info': self._get_repository_info(repo),
-                'code_context': self._get_code_context(repo, issue),
-                'documentation': self._get_relevant_documentation(repo, issue),
+                'related_issues': self._get_related_issues(repo, issue_number, issue_info['labels']),
+                'repository_info': self._get_repository_info(repo, repo_name),
+                'code_context': self._get_code_context(repo, issue_info['body']),
+                'documentation': self._get_relevant_documentation(repo, repo_name, self._issue_text(issue_info)),
             }
 
             return {
@@ -46,14 +190,183 @@ class IssueParser:
             logger.error(f"Error parsing issue: {str(e)}")
             raise
 
-    def _get_related_issues(self, repo: Repository, issue: Issue) -> List[Dict]:
+    def get_symbol_index(self, repo_name: str) -> SymbolIndex:
+        """
+        Return the repository's symbol index, bringing it up to date as needed.
+
+        A cold index is built before returning. A warm one past its TTL is
+        returned as is while a background refresh re-indexes changed blobs.
+        """
+        with self.index_lock:
+            index = self.symbol_indexes.get(repo_name)
+            if index is None:
+                index = SymbolIndex(repo_name, self.graphql_client, self.github)
+                self.symbol_indexes[repo_name] = index
+
+        if index.is_empty:
+            index.refresh()
+        elif time.monotonic() - index.checked_at > SYMBOL_INDEX_TTL:
+            # Stamped now so concurrent callers do not queue the same refresh
+            index.checked_at = time.monotonic()
+            self.index_executor.submit(self._refresh_index, index)
+        return index
+
+    @staticmethod
+    def _refresh_index(index: SymbolIndex) -> None:
+        try:
+            index.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing symbol index of {index.repo_name}: {str(e)}")
+
+    @staticmethod
+    def _prompt_chars(content: str) -> int:
+        # Files past MAX_FILE_CONTEXT_CHARS are summarized to about that size in the prompt
+        return min(len(content), MAX_FILE_CONTEXT_CHARS)
+
+    def _add_indexed_code_context(self, repo_name: str, issue_data: Dict) -> None:
+        """
+        Add the indexed files that best match the issue text to its code context.
+
+        Files the issue names are always kept; indexed files are added in rank
+        order only while the code context stays within code_context_chars.
+        """
+        try:
+            issue = issue_data['issue']
+            index = self.get_symbol_index(repo_name)
+            code_context = issue_data['context']['code_context']
+            results = [
+                result for result in index.search(f"{issue['title']}\n{issue['body'] or ''}", SYMBOL_INDEX_RESULTS)
+                if result['path'] not in code_context
+            ]
+            contents = index.get_content(result['path'] for result in results)
+            used = sum(self._prompt_chars(entry['content']) for entry in code_context.values())
+            added = []
+            for result in results:
+                if result['path'] not in contents:
+                    continue
+                size = self._prompt_chars(contents[result['path']])
+                if self.code_context_chars is not None and used + size > self.code_context_chars:
+                    logger.info(f"Skipping indexed file {result['path']}: code context budget reached")
+                    continue
+                code_context[result['path']] = {
+                    'content': contents[result['path']],
+                    'path': result['path'],
+                    'sha': result['sha'],
+                }
+                used += size
+                added.append(result['path'])
+            logger.info(f"Selected code context from symbol index: {added}")
+        except Exception as e:
+            logger.error(f"Error querying symbol index: {str(e)}")
+
+    def apply_push(self, repo_name: str, before: Optional[str], after: str, changed: Set[str],
+                   removed: Set[str], full: bool = False) -> None:
+        """
+        Bring the repository's cached context in line with a push to its default branch.
+
+        The tree listing is patched, the docs listing is dropped if a doc
+        changed, issue contexts that include a changed file are dropped, and
+        the symbol index re-indexes just those files (in the background).
+        With full=True, for pushes whose file lists cannot be trusted, all
+        of the repository's file-derived entries are dropped and the index
+        is refreshed.
+        """
+        touched = changed | removed
+
+        def includes_touched(key, value) -> bool:
+            if key[0] != repo_name:
+                return False
+            context = value['issue_data']['context']
+            paths = list(context['code_context']) + list(context['documentation'])
+            return full or any(path in touched for path in paths)
+
+        dropped = self.issue_context_cache.invalidate_if(includes_touched)
+
+        if full or any(is_doc_path(path) for path in touched):
+            self.context_cache.invalidate(('doc_entries', repo_name))
+
+        tree_key = ('tree_paths', repo_name)
+        tree_paths = self.context_cache.peek(tree_key)
+        if full or tree_paths is None:
+            self.context_cache.invalidate(tree_key)
+        elif changed - tree_paths or removed:
+            tree_paths = set(tree_paths) - removed
+            for path in changed:
+                while path and path not in tree_paths:
+                    tree_paths.add(path)
+                    path = posixpath.dirname(path)
+            self.context_cache.set(tree_key, tree_paths)
+
+        with self.index_lock:
+            index = self.symbol_indexes.get(repo_name)
+        if index is not None:
+            if full or not before:
+                self.index_executor.submit(self._refresh_index, index)
+            else:
+                self.index_executor.submit(self._apply_push_to_index, index, before, after, changed, removed)
+
+        logger.info(
+            f"Applied push to {repo_name} at {after[:7]}: {len(touched)} paths changed, "
+            f"{dropped} cached issue contexts dropped"
+        )
+
+    @staticmethod
+    def _apply_push_to_index(index: SymbolIndex, before: str, after: str, changed: Set[str], removed: Set[str]) -> None:
+        try:
+            index.apply_push(before, after, changed, removed)
+        except Exception as e:
+            logger.error(f"Error applying push to symbol index of {index.repo_name}: {str(e)}")
+
+    def get_tree_paths(self, repo_name: str) -> Optional[Set[str]]:
+        """
+        Return every file and directory path on the default branch.
+
+        Served from the metadata cache. Returns None when the tree is too
+        large for a single recursive listing, since a partial set cannot
+        prove a path is missing.
+        """
+        return self.context_cache.get(('tree_paths', repo_name), lambda: self._load_tree(repo_name)['paths'])
+
+    def get_doc_entries(self, repo_name: str) -> List[Dict]:
+        """Return the default branch's documentation files (path, sha, size), from the metadata cache."""
+        return self.context_cache.get(('doc_entries', repo_name), lambda: self._load_tree(repo_name)['docs'])
+
+    def _doc_entries_or_none(self, repo_name: str) -> Optional[List[Dict]]:
+        try:
+            return self.get_doc_entries(repo_name)
+        except Exception as e:
+            logger.error(f"Error listing documentation files: {str(e)}")
+            return None
+
+    def _load_tree(self, repo_name: str) -> Dict:
+        """
+        Fetch the default branch's tree in one recursive call.
+
+        Both the path set and the documentation entries are cached from it,
+        whichever of them was asked for.
+        """
+        keys = {'paths': ('tree_paths', repo_name), 'docs': ('doc_entries', repo_name)}
+        # Taken before the fetch so an invalidation during it discards the result
+        generations = {name: self.context_cache.generation(key) for name, key in keys.items()}
+        repo = self.github.get_repo(repo_name, lazy=True)
+        tree = repo.get_git_tree('HEAD', recursive=True)
+        paths = {element.path for element in tree.tree}
+        if tree.raw_data.get('truncated'):
+            logger.warning(f"Tree of {repo_name} is truncated, skipping path checks")
+            paths = None
+        loaded = {'paths': paths, 'docs': doc_entries(tree.tree)}
+        for name, key in keys.items():
+            self.context_cache.set(key, loaded[name], generations[name])
+        return loaded
+
+    def _get_related_issues(self, repo: Repository, issue_number: int, labels: List[str]) -> List[Dict]:
         """Get related issues based on labels and content similarity."""
         related_issues = []
         try:
             # Get issues with similar labels
-            for label in issue.labels:
-                for related_issue in repo.get_issues(state='all', labels=[label.name]):
-                    if related_issue.number != issue.number:
+            for label in labels:
+                for related_issue in repo.get_issues(state='all', labels=[label]):
+                    if related_issue.number != issue_number:
                         related_issues.append({
                             'number': related_issue.number,
                             'title': related_issue.title,
@@ -64,20 +377,27 @@ class IssueParser:
             logger.error(f"Error getting related issues: {str(e)}")
         return related_issues
 
-    def _get_repository_info(self, repo: Repository) -> Dict:
-        """Get relevant repository information."""
+    def _get_repository_info(self, repo: Repository, repo_name: str) -> Dict:
+        """Get relevant repository information, served from the metadata cache."""
         try:
-            return {
-                'description': repo.description,
-                'topics': repo.get_topics(),
-                'default_branch': repo.default_branch,
-                'contributors': [contributor.login for contributor in repo.get_contributors()],
-                'recent_commits': self._get_recent_commits(repo)
-            }
+            return self.context_cache.get(
+                ('repository_info', repo_name),
+                lambda: self._load_repository_info(repo)
+            )
         except Exception as e:
             logger.error(f"Error getting repository info: {str(e)}")
             return {}
 
+    def _load_repository_info(self, repo: Repository) -> Dict:
+        """Fetch repository information from the API."""
+        return {
+            'description': repo.description,
+            'topics': repo.get_topics(),
+            'default_branch': repo.default_branch,
+            'contributors': [contributor.login for contributor in repo.get_contributors()],
+            'recent_commits': self._get_recent_commits(repo)
+        }
+
     def _get_recent_commits(self, repo: Repository, limit: int = 5) -> List[Dict]:
         """Get recent commits from the repository."""
         commits = []
@@ -93,13 +413,13 @@ class IssueParser:
             logger.error(f"Error getting recent commits: {str(e)}")
         return commits
 
-    def _get_code_context(self, repo: Repository, issue: Issue) -> Dict:
+    def _get_code_context(self, repo: Repository, body: Optional[str]) -> Dict:
         """Get relevant code context based on issue content."""
         code_context = {}
         try:
             # Search for code references in issue body
             import re
-            code_refs = re.findall(r'`([^`]+)`', issue.body)
+            code_refs = re.findall(r'`([^`]+)`', body or '')
             
             for ref in code_refs:
                 try:
@@ -108,7 +428,8 @@ class IssueParser:
                     if content:
                         code_context[ref] = {
                             'content': content.decoded_content.decode(),
-                            'path': content.path
+                            'path': content.path,
+                            'sha': content.sha
                         }
                 except:
                     continue
@@ -116,19 +437,18 @@ class IssueParser:
             logger.error(f"Error getting code context: {str(e)}")
         return code_context
 
-    def _get_relevant_documentation(self, repo: Repository, issue: Issue) -> Dict:
+    def _get_relevant_documentation(self, repo: Repository, repo_name: str, issue_text: str) -> Dict:
         """Get relevant documentation based on issue content."""
         docs = {}
         try:
-            # Look for documentation files
-            doc_files = ['README.md', 'CONTRIBUTING.md', 'docs/']
-            for doc_file in doc_files:
+            # Choose from the tree metadata, then download only the chosen blobs
+            chosen = select_docs(self.get_doc_entries(repo_name), issue_text)
+            blobs = self.docs_executor.map(lambda entry: repo.get_git_blob(entry['sha']), chosen)
+            for entry, blob in zip(chosen, blobs):
                 try:
-                    content = repo.get_contents(doc_file)
-                    if content:
-                        docs[doc_file] = content.decoded_content.decode()
-                except:
+                    docs[entry['path']] = base64.b64decode(blob.content).decode()
+                except UnicodeDecodeError:
                     continue
         except Exception as e:
             logger.error(f"Error getting documentation: {str(e)}")
-        return docs 
\ No newline at end of file
+        return rank_documents(docs, issue_text) 
\ No newline at end of file
@@ -0,0 +1,83 @@
+import logging
+import threading
+from typing import List, Optional
+
+from github import Github
+from github.GithubException import GithubException
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class IssueWriteBack:
+    """
+    A job's user-visible updates to an issue, written in as few calls as possible.
+
+    progress() shows the job's current state in a single status comment,
+    created on first use and edited in place afterwards. comment() and
+    label() only buffer; flush() writes the buffered comments as one
+    comment body (into the status comment when there is one) and the
+    buffered labels in one call. Every write costs against GitHub's
+    secondary rate limit, so a job should flush once, at its end.
+    """
+
+    def __init__(self, github: Github, repo_name: str, issue_number: int, comment_id: Optional[int] = None):
+        self.github = github
+        self.repo_name = repo_name
+        self.issue_number = issue_number
+        self.comment_id = comment_id
+        self.comments: List[str] = []
+        self.labels: List[str] = []
+        self._issue = None
+        self._comment = None
+        self.lock = threading.Lock()
+
+    def issue(self):
+        """The issue, fetched once per write-back."""
+        if self._issue is None:
+            self._issue = self.github.get_repo(self.repo_name).get_issue(number=self.issue_number)
+        return self._issue
+
+    def _write_status(self, body: str) -> int:
+        # Called with the lock held
+        if self._comment is None and self.comment_id is not None:
+            try:
+                self._comment = self.issue().get_comment(self.comment_id)
+            except GithubException as e:
+                if e.status != 404:
+                    raise
+                logger.warning(f"Status comment {self.comment_id} on issue #{self.issue_number} is gone, posting a new one")
+        if self._comment is None:
+            self._comment = self.issue().create_comment(body)
+            self.comment_id = self._comment.id
+        else:
+            self._comment.edit(body)
+        return self.comment_id
+
+    def progress(self, text: str) -> int:
+        """Show text in the status comment, returning the comment's id."""
+        with self.lock:
+            return self._write_status(text)
+
+    def comment(self, text: str) -> None:
+        with self.lock:
+            self.comments.append(text)
+
+    def label(self, *labels: str) -> None:
+        with self.lock:
+            self.labels.extend(label for label in labels if label and label not in self.labels)
+
+    def flush(self) -> None:
+        """Write the buffered comments and labels, at most one call each."""
+        with self.lock:
+            comments, self.comments = self.comments, []
+            labels, self.labels = self.labels, []
+            if comments:
+                self._write_status('\n\n'.join(comments))
+            if labels:
+                self.issue().add_to_labels(*labels)
+            logger.info(
+                f"Wrote back {len(comments)} comments and {len(labels)} labels to issue #{self.issue_number} "
+                f"in {self.repo_name}"
+            )
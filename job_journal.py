@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job statuses
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def new_worker_id() -> str:
+    """A lease owner id that is unique across hosts, processes and threads."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class LeaseLost(Exception):
+    """Raised when a job's lease expired and another worker may have claimed it."""
+
+
+class Job:
+    """A journaled job; each completed step's result is saved so a rerun skips it."""
+
+    def __init__(self, journal: 'JobJournal', job_id: int, repo_name: str, issue_number: int,
+                 source: str, payload: Dict, resumed: bool, owner: str):
+        self.journal = journal
+        self.id = job_id
+        self.repo_name = repo_name
+        self.issue_number = issue_number
+        self.source = source
+        self.payload = payload
+        self.resumed = resumed
+        self.owner = owner
+        self.lease_lost = threading.Event()
+
+    def step(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Return the saved result of step name, or run fn, save its result and return it."""
+        found, data = self.journal.get_step(self.id, name)
+        if found:
+            logger.info(f"Job {self.id}: step '{name}' already done, skipping")
+            return data
+        if self.lease_lost.is_set():
+            raise LeaseLost(f"Job {self.id} lost its lease before step '{name}'")
+        data = fn()
+        self.journal.record_step(self.id, name, data)
+        return data
+
+    @contextmanager
+    def keep_alive(self) -> Iterator['Job']:
+        """Renew the job's lease in the background while the block runs."""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.journal.lease_seconds / 3):
+                if not self.journal.heartbeat(self.id, self.owner):
+                    logger.error(f"Job {self.id} lost its lease")
+                    self.lease_lost.set()
+                    return
+
+        thread = threading.Thread(target=renew, name=f'lease-{self.id}', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+    def finish(self) -> None:
+        self.journal.set_status(self.id, DONE)
+
+    def fail(self, error: str) -> None:
+        self.journal.set_status(self.id, FAILED, error)
+
+
+class JobJournal:
+    """
+    Crash-safe store of jobs and their completed steps, in a WAL-mode SQLite file.
+
+    A step's result is committed as soon as the step completes, so after a
+    crash a job resumes from its last completed step. Results are stored as
+    JSON.
+
+    The file doubles as the job queue shared by worker processes on a host.
+    A worker claims a pending job, or a running one whose lease expired,
+    with a lease it renews by heartbeat; a worker that dies stops renewing
+    and its job is reclaimed once the lease runs out.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 120):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        # Autocommit mode, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, repo TEXT, issue_number INTEGER, source TEXT, '
+            'fingerprint TEXT, payload TEXT, status TEXT, error TEXT, created_at REAL, updated_at REAL, '
+            'lease_owner TEXT, lease_expires REAL)'
+        )
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')}
+        for column, kind in (('lease_owner', 'TEXT'), ('lease_expires', 'REAL')):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS jobs_issue ON jobs (repo, issue_number, status)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS steps ('
+            'job_id INTEGER, step TEXT, data TEXT, completed_at REAL, PRIMARY KEY (job_id, step))'
+        )
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def _unfinished(self, conn: sqlite3.Connection, repo_name: str, issue_number: int, fingerprint: str):
+        # Failed jobs are left out: resuming one would replay the generation it failed on
+        return conn.execute(
+            'SELECT id, source, status, lease_expires FROM jobs WHERE repo = ? AND issue_number = ? '
+            'AND status IN (?, ?) AND fingerprint = ? ORDER BY id DESC LIMIT 1',
+            (repo_name, issue_number, PENDING, RUNNING, fingerprint)
+        ).fetchone()
+
+    def enqueue(self, repo_name: str, issue_number: int, fingerprint: str, source: str, payload: Dict) -> Optional[int]:
+        """
+        Queue a job for workers to claim, returning its id, or None if one is already queued or running.
+
+        A job interrupted by a crash for the same unchanged issue is queued
+        again, so the worker that claims it resumes after its completed steps.
+        A failed job is not; retriggering it queues a fresh job.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = self._unfinished(conn, repo_name, issue_number, fingerprint)
+            if row and (row[2] == PENDING or (row[3] or 0) > now):
+                return None
+            if row:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, payload = ?, lease_owner = NULL, updated_at = ? WHERE id = ?',
+                    (PENDING, json.dumps(payload), now, row[0])
+                )
+                return row[0]
+            cursor = conn.execute(
+                'INSERT INTO jobs (repo, issue_number, source, fingerprint, payload, status, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (repo_name, issue_number, source, fingerprint, json.dumps(payload), PENDING, now, now)
+            )
+            return cursor.lastrowid
+
+    def open_job(self, repo_name: str, issue_number: int, fingerprint: str, source: str, payload: Dict,
+                 owner: str) -> Optional[Job]:
+        """
+        Start a job for an issue under owner's lease, resuming its last unfinished one if there is one.
+
+        An unfinished (pending, or running when a crash interrupted it) job is
+        resumed only if the issue text it was started for is unchanged, as
+        given by fingerprint. Otherwise, and always after a failed job, a
+        fresh job starts and earlier results are not reused.
+        Returns None if the job is running under another worker's live lease.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = self._unfinished(conn, repo_name, issue_number, fingerprint)
+            if row and row[2] == RUNNING and (row[3] or 0) > now:
+                return None
+            if row:
+                job_id = row[0]
+                conn.execute(
+                    'UPDATE jobs SET status = ?, payload = ?, lease_owner = ?, lease_expires = ?, '
+                    'updated_at = ? WHERE id = ?',
+                    (RUNNING, json.dumps(payload), owner, now + self.lease_seconds, now, job_id)
+                )
+                logger.info(f"Resuming job {job_id} for issue #{issue_number} in {repo_name}")
+                return Job(self, job_id, repo_name, issue_number, row[1], payload, True, owner)
+
+            cursor = conn.execute(
+                'INSERT INTO jobs (repo, issue_number, source, fingerprint, payload, status, created_at, updated_at, '
+                'lease_owner, lease_expires) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (repo_name, issue_number, source, fingerprint, json.dumps(payload), RUNNING, now, now,
+                 owner, now + self.lease_seconds)
+            )
+            return Job(self, cursor.lastrowid, repo_name, issue_number, source, payload, False, owner)
+
+    def active_job_id(self, repo_name: str, issue_number: int) -> Optional[int]:
+        """The id of the issue's pending or running job, if it has one."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT id FROM jobs WHERE repo = ? AND issue_number = ? AND status IN (?, ?) ORDER BY id DESC LIMIT 1',
+                (repo_name, issue_number, PENDING, RUNNING)
+            ).fetchone()
+        return row[0] if row else None
+
+    def claim(self, owner: str) -> Optional[Job]:
+        """Lease the oldest pending job, or running job whose lease expired, to owner."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT id, repo, issue_number, source, payload, status FROM jobs '
+                'WHERE status = ? OR (status = ? AND (lease_expires IS NULL OR lease_expires < ?)) '
+                'ORDER BY id LIMIT 1',
+                (PENDING, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, updated_at = ? WHERE id = ?',
+                (RUNNING, owner, now + self.lease_seconds, now, row[0])
+            )
+        resumed = row[5] == RUNNING or self.get_step(row[0], 'context')[0]
+        if row[5] == RUNNING:
+            logger.info(f"Reclaimed job {row[0]} for issue #{row[2]} in {row[1]} after its lease expired")
+        return Job(self, row[0], row[1], row[2], row[3], json.loads(row[4]), resumed, owner)
+
+    def release_dead_leases(self) -> int:
+        """
+        Expire the leases on running jobs held by processes on this host that are gone.
+
+        Meant for a process that has just started and holds no leases yet:
+        a lease owned by its own pid was left by an earlier process that had
+        the same pid, as a server restarted in a container usually does.
+        Returns the number of leases released.
+        """
+        host = socket.gethostname()
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, lease_owner FROM jobs WHERE status = ? AND lease_owner LIKE ?', (RUNNING, f'{host}:%')
+            ).fetchall()
+        dead = [job_id for job_id, owner in rows if not _process_alive(int(owner.split(':')[1]))]
+        for job_id in dead:
+            self.release(job_id)
+        return len(dead)
+
+    def release(self, job_id: int) -> None:
+        """Give up the lease on a running job so it can be claimed right away."""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ? AND status = ?',
+                (time.time(), job_id, RUNNING)
+            )
+
+    def heartbeat(self, job_id: int, owner: str) -> bool:
+        """Extend owner's lease on a job; False if the lease is no longer owner's."""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                'UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?',
+                (now + self.lease_seconds, now, job_id, owner, RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def get_step(self, job_id: int, step: str) -> tuple:
+        """Return (found, data) for a step of a job."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT data FROM steps WHERE job_id = ? AND step = ?', (job_id, step)
+            ).fetchone()
+        return (True, json.loads(row[0])) if row else (False, None)
+
+    def record_step(self, job_id: int, step: str, data: Any) -> None:
+        """Save a completed step's result, committing immediately."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO steps (job_id, step, data, completed_at) VALUES (?, ?, ?, ?)',
+                (job_id, step, json.dumps(data), now)
+            )
+            conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (now, job_id))
+
+    def set_status(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? '
+                'WHERE id = ?',
+                (status, error, time.time(), job_id)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Count pending jobs, and running jobs by whether their lease is live."""
+        now = time.time()
+        with self.lock:
+            pending = self.conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (PENDING,)).fetchone()[0]
+            running, expired = self.conn.execute(
+                'SELECT COALESCE(SUM(lease_expires >= ?), 0), COALESCE(SUM(lease_expires IS NULL OR lease_expires < ?), 0) '
+                'FROM jobs WHERE status = ?',
+                (now, now, RUNNING)
+            ).fetchone()
+        return {'pending': pending, 'running': running, 'expired': expired}
+
+    def close(self) -> None:
+        self.conn.close()
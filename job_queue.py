@@ -0,0 +1,114 @@
+import math
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACCEPTED = 'accepted'
+DEFERRED = 'deferred'
+REJECTED = 'rejected'
+DUPLICATE = 'duplicate'
+
+# Completed job durations kept for the Retry-After estimate
+DURATION_SAMPLES = 50
+
+
+class JobQueue:
+    """
+    Bounded pool for webhook-triggered jobs.
+
+    At most max_in_flight jobs run at once and at most max_queued more wait
+    for a worker. Past that, a job is either rejected (the caller answers 503
+    with Retry-After) or, with policy='defer', parked in a deferred list of
+    up to max_deferred jobs that is drained as workers free up. A job whose
+    key is already queued, running or deferred is not added again.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int, policy: str = 'reject',
+                 max_deferred: int = 0, retry_after: int = 30):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.policy = policy
+        self.max_deferred = max_deferred
+        self.min_retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='job')
+        self.active: Dict[Hashable, str] = {}
+        self.deferred = deque()
+        self.deferred_keys = set()
+        self.durations = deque(maxlen=DURATION_SAMPLES)
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.max_in_flight + self.max_queued
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new job would be deferred or rejected."""
+        with self.lock:
+            return len(self.active) >= self.capacity
+
+    def submit(self, key: Hashable, fn: Callable, *args) -> str:
+        """Run fn(*args) on the pool, returning ACCEPTED, DEFERRED, REJECTED or DUPLICATE."""
+        with self.lock:
+            if key in self.active or key in self.deferred_keys:
+                return DUPLICATE
+            if len(self.active) < self.capacity:
+                self._start(key, fn, args)
+                return ACCEPTED
+            if self.policy == 'defer' and len(self.deferred) < self.max_deferred:
+                self.deferred.append((key, fn, args))
+                self.deferred_keys.add(key)
+                logger.warning(f"Job queue saturated, deferred job {key} ({len(self.deferred)} deferred)")
+                return DEFERRED
+        logger.warning(f"Job queue saturated, rejected job {key}")
+        return REJECTED
+
+    def _start(self, key: Hashable, fn: Callable, args: tuple) -> None:
+        # Called with the lock held
+        self.active[key] = 'queued'
+        self.executor.submit(self._run, key, fn, args)
+
+    def _run(self, key: Hashable, fn: Callable, args: tuple) -> None:
+        with self.lock:
+            self.active[key] = 'running'
+        started = time.monotonic()
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Error running job {key}: {str(e)}")
+        finally:
+            with self.lock:
+                self.durations.append(time.monotonic() - started)
+                del self.active[key]
+                if self.deferred:
+                    next_key, next_fn, next_args = self.deferred.popleft()
+                    self.deferred_keys.discard(next_key)
+                    self._start(next_key, next_fn, next_args)
+
+    def retry_after(self) -> int:
+        """Estimate the seconds until a worker frees up, never less than the configured minimum."""
+        with self.lock:
+            if not self.durations:
+                return self.min_retry_after
+            average = sum(self.durations) / len(self.durations)
+            waiting = len(self.active) - self.max_in_flight + len(self.deferred) + 1
+        return max(self.min_retry_after, math.ceil(average * max(waiting, 1) / self.max_in_flight))
+
+    def stats(self) -> Dict:
+        with self.lock:
+            running = sum(1 for state in self.active.values() if state == 'running')
+            return {
+                'running': running,
+                'queued': len(self.active) - running,
+                'deferred': len(self.deferred),
+                'max_in_flight': self.max_in_flight,
+                'max_queued': self.max_queued,
+                'saturated': len(self.active) >= self.capacity,
+            }
@@ -0,0 +1,86 @@
+import logging
+
+from ai_engine import AIEngine
+from github_handler import GitHubHandler
+from job_journal import Job
+from issue_writeback import IssueWriteBack
+from notifications import notify
+from config import PROGRESS_COMMENTS, PR_CREATED_LABEL
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def pull_request_data(pr):
+    """The parts of a PR later steps need, in a form the journal can store."""
+    return {'number': pr.number, 'url': pr.html_url}
+
+
+def run_job(job: Job, ai_engine: AIEngine, github_handler: GitHubHandler) -> None:
+    """
+    Generate code for a job's issue and open a PR with it, reporting the outcome on the issue.
+
+    Each step is journaled as it completes: context gathered, LLM output,
+    changes committed, PR opened, issue commented. A
+    rerun of the job after a crash resumes after the last completed step
+    instead of paying for them again; a failed job is rerun from scratch.
+
+    The issue gets one status comment per job, edited in place as the job
+    progresses, and the outcome and labels are written back once at the end.
+    Start, PR and failure events also go to the chat notification channels,
+    which only queues them.
+    """
+    repo_name = job.repo_name
+    issue_number = job.issue_number
+    prefetched = job.payload
+    writeback = IssueWriteBack(github_handler.github, repo_name, issue_number)
+    try:
+        with job.keep_alive():
+            notify(f"Working on {repo_name}#{issue_number}", repo=repo_name, issue=issue_number)
+            if PROGRESS_COMMENTS:
+                # Journaled so a resumed job keeps editing the same comment
+                writeback.comment_id = job.step('progress_comment', lambda: writeback.progress(
+                    "Working on this issue: gathering context and generating changes."
+                ))
+
+            # Generate code changes using AI
+            issue_data = job.step('context', lambda: ai_engine.gather_context(repo_name, issue_number, prefetched))
+            code_changes = job.step(
+                'generation', lambda: ai_engine.generate_from_context(repo_name, issue_number, issue_data)
+            )
+            if PROGRESS_COMMENTS:
+                writeback.progress(
+                    f"Working on this issue: committing changes to {len(code_changes['changes'])} file(s)."
+                )
+
+            # Commit the changes to the issue's branch; a rerun moves the existing branch and PR
+            repo = github_handler.github.get_repo(repo_name)
+            commit = job.step('commit', lambda: github_handler.commit_changes(
+                repo, issue_number, code_changes['changes'], code_changes.get('edit_format', 'whole')
+            ))
+            pr = job.step('pull_request', lambda: pull_request_data(github_handler.open_pull_request(
+                repo, commit['branch'], commit['base'],
+                title=f"Fix for issue #{issue_number}",
+                body=code_changes['explanation']
+            )))
+
+            logger.info(f"Created PR: {pr['url']}")
+            notify(f"Opened PR for {repo_name}#{issue_number}: {pr['url']}", repo=repo_name, issue=issue_number)
+
+            # Link PR to issue and update issue with PR link, in one comment and one label call
+            writeback.comment(f"Linked PR: #{pr['number']}")
+            writeback.comment(f"PR created: {pr['url']}")
+            writeback.label(PR_CREATED_LABEL)
+            job.step('write_back', writeback.flush)
+        job.finish()
+
+    except Exception as e:
+        logger.error(f"Error processing {job.source}: {str(e)}")
+        if job.lease_lost.is_set():
+            # Another worker owns the job now; leave its status and the issue to it
+            return
+        job.fail(str(e))
+        notify(f"Failed on {repo_name}#{issue_number}: {str(e)}", repo=repo_name, issue=issue_number)
+        writeback.comment(f"Error processing {job.source}: {str(e)}")
+        writeback.flush()
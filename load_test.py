@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Record-and-replay load testing against recorded production traffic.
+
+Recording: run the server with CASSETTE_DIR set to capture webhook
+deliveries, and point it at a recording proxy so the GitHub and OpenAI
+responses its jobs see go into the same cassette:
+
+    python load_test.py proxy cassettes/burst --record
+    GITHUB_API_URL=http://localhost:8900/github OPENAI_BASE_URL=http://localhost:8900/openai/v1 \\
+        CASSETTE_DIR=cassettes/burst python main.py
+
+Replaying: serve the recorded responses from the same proxy and feed the
+deliveries back at their recorded pace, or N times faster:
+
+    python load_test.py proxy cassettes/burst --replay --latency --speed 4
+    python load_test.py replay cassettes/burst --target http://localhost:3000/webhook --speed 4 \\
+        --output after.json --baseline before.json
+
+The replay reports status counts and delivery latency percentiles, and with
+--baseline the change against an earlier run's --output.
+"""
+
+import hmac
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, Response, request
+from dotenv import load_dotenv
+from cassette import Cassette, HTTP_FILE, WEBHOOKS_FILE, body_digest, decode_body, encode_body, read_entries
+from config import WEBHOOK_SECRET
+from http_client import get_session
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+UPSTREAMS = {
+    'github': 'https://api.github.com',
+    'openai': 'https://api.openai.com',
+}
+
+# Headers that describe one connection or encoding and are not passed through the proxy
+HOP_HEADERS = {
+    'host', 'connection', 'keep-alive', 'transfer-encoding', 'content-length', 'content-encoding',
+    'accept-encoding', 'proxy-authorization', 'te', 'trailer', 'upgrade'
+}
+
+# Completion requests can take minutes
+UPSTREAM_TIMEOUT = 600
+
+PERCENTILES = (50, 90, 99)
+
+
+def _forward_headers(headers) -> Dict[str, str]:
+    return {name: value for name, value in headers.items() if name.lower() not in HOP_HEADERS}
+
+
+def _rewrite(text: str, upstream: str, local: str) -> str:
+    """Point upstream URLs in a response at the proxy, so clients that follow them stay on it."""
+    return text.replace(upstream, local)
+
+
+class ResponseLibrary:
+    """Recorded responses, served in recorded order for each request."""
+
+    def __init__(self, directory: str):
+        self.exact: Dict[Tuple, List[Dict]] = defaultdict(list)
+        self.loose: Dict[Tuple, List[Dict]] = defaultdict(list)
+        for entry in read_entries(directory, HTTP_FILE):
+            self.exact[(entry['service'], entry['method'], entry['path'], entry['body_sha'])].append(entry)
+            self.loose[(entry['service'], entry['method'], entry['path'])].append(entry)
+        self.served = Counter()
+        self.lock = threading.Lock()
+        logger.info(f"Loaded {sum(len(entries) for entries in self.loose.values())} recorded responses")
+
+    def _next(self, index: Dict[Tuple, List[Dict]], key: Tuple) -> Optional[Dict]:
+        entries = index.get(key)
+        if not entries:
+            return None
+        # Repeat the last response once a request is made more often than it was recorded
+        entry = entries[min(self.served[key], len(entries) - 1)]
+        self.served[key] += 1
+        return entry
+
+    def match(self, service: str, method: str, path: str, body: bytes) -> Optional[Dict]:
+        """The recorded response to the same request, or failing that to the same method and path."""
+        with self.lock:
+            return (self._next(self.exact, (service, method, path, body_digest(body)))
+                    or self._next(self.loose, (service, method, path)))
+
+
+def create_proxy(directory: str, mode: str, latency: bool = False, speed: float = 1.0) -> Flask:
+    """
+    A proxy for the GitHub and OpenAI APIs, mounted at /github and /openai.
+
+    In 'record' mode requests are forwarded upstream and each response is
+    appended to the cassette with its latency. In 'replay' mode the
+    recorded responses are served instead, optionally after their recorded
+    latency divided by speed.
+    """
+    app = Flask(__name__)
+    cassette = Cassette(directory, HTTP_FILE) if mode == 'record' else None
+    library = ResponseLibrary(directory) if mode == 'replay' else None
+
+    @app.route('/<service>/<path:path>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD'])
+    def proxy(service, path):
+        if service not in UPSTREAMS:
+            return Response(json.dumps({'message': f"Unknown service {service}"}), 404,
+                            content_type='application/json')
+        full_path = '/' + path
+        if request.query_string:
+            full_path += '?' + request.query_string.decode('utf-8')
+        body = request.get_data()
+        upstream = UPSTREAMS[service]
+        local = request.host_url.rstrip('/') + '/' + service
+
+        if library is not None:
+            entry = library.match(service, request.method, full_path, body)
+            if entry is None:
+                logger.warning(f"No recorded response for {request.method} {service}{full_path}")
+                return Response(json.dumps({'message': 'Not Found in cassette'}), 404,
+                                content_type='application/json')
+            if latency:
+                time.sleep(entry['duration'] / speed)
+            content = decode_body(entry)
+            if entry.get('encoding') == 'utf-8':
+                content = _rewrite(entry['body'], upstream, local)
+            headers = {name: _rewrite(value, upstream, local) for name, value in entry['headers'].items()}
+            return Response(content, entry['status'], headers=headers)
+
+        start = time.monotonic()
+        try:
+            upstream_response = get_session().request(
+                request.method, upstream + full_path, headers=_forward_headers(request.headers),
+                data=body, timeout=UPSTREAM_TIMEOUT, allow_redirects=False
+            )
+        except Exception as e:
+            logger.error(f"Error forwarding {request.method} {service}{full_path}: {str(e)}")
+            return Response(json.dumps({'message': str(e)}), 502, content_type='application/json')
+        duration = time.monotonic() - start
+
+        headers = _forward_headers(upstream_response.headers)
+        entry = {
+            'type': 'http',
+            'time': time.time(),
+            'service': service,
+            'method': request.method,
+            'path': full_path,
+            'body_sha': body_digest(body),
+            'status': upstream_response.status_code,
+            'headers': headers,
+            'duration': duration,
+        }
+        entry.update(encode_body(upstream_response.content))
+        cassette.record(entry)
+
+        content = upstream_response.content
+        if entry['encoding'] == 'utf-8':
+            content = _rewrite(entry['body'], upstream, local)
+        headers = {name: _rewrite(value, upstream, local) for name, value in headers.items()}
+        return Response(content, upstream_response.status_code, headers=headers)
+
+    return app
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def _sign(body: bytes, secret: str) -> str:
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def replay_webhooks(directory: str, target: str, speed: float = 1.0, workers: int = 32,
+                    secret: Optional[str] = None) -> Dict:
+    """
+    Send a cassette's deliveries to target, spaced by their recorded gaps divided by speed.
+
+    Deliveries are sent concurrently, so a recorded burst arrives as a
+    burst. With a secret each delivery is signed again, for a target whose
+    webhook secret differs from the one that was recorded. Returns a summary
+    of statuses and delivery latencies.
+    """
+    deliveries = sorted(read_entries(directory, WEBHOOKS_FILE), key=lambda entry: entry['time'])
+    if not deliveries:
+        logger.warning(f"No webhook deliveries recorded in {directory}")
+        return {'deliveries': 0}
+
+    session = get_session()
+    results = []
+    results_lock = threading.Lock()
+
+    def send(entry: Dict, due: float) -> None:
+        body = decode_body(entry)
+        headers = dict(entry['headers'])
+        if secret:
+            headers['X-Hub-Signature-256'] = _sign(body, secret)
+        sent = time.monotonic()
+        try:
+            status = session.post(target, data=body, headers=headers).status_code
+        except Exception as e:
+            logger.error(f"Error delivering {headers.get('X-GitHub-Delivery')}: {str(e)}")
+            status = 'error'
+        with results_lock:
+            results.append({'status': status, 'latency': time.monotonic() - sent, 'lag': sent - due})
+
+    first = deliveries[0]['time']
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for entry in deliveries:
+            due = start + (entry['time'] - first) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, entry, due)
+    elapsed = time.monotonic() - start
+
+    latencies = [result['latency'] for result in results]
+    summary = {
+        'deliveries': len(results),
+        'speed': speed,
+        'elapsed': elapsed,
+        'rate': len(results) / elapsed if elapsed else 0.0,
+        'statuses': dict(Counter(str(result['status']) for result in results)),
+        'max_lag': max(result['lag'] for result in results),
+        'latency_max': max(latencies),
+    }
+    for percentile in PERCENTILES:
+        summary[f'latency_p{percentile}'] = _percentile(latencies, percentile)
+    return summary
+
+
+def print_summary(summary: Dict, baseline: Optional[Dict] = None) -> None:
+    print(f"\nReplayed {summary['deliveries']} deliveries at {summary['speed']}x in {summary['elapsed']:.1f}s "
+          f"({summary['rate']:.2f}/s)")
+    print(f"Statuses: {summary['statuses']}")
+    print(f"Largest send delay behind schedule: {summary['max_lag'] * 1000:.0f} ms")
+    for key in [f'latency_p{percentile}' for percentile in PERCENTILES] + ['latency_max']:
+        line = f"{key:>12}: {summary[key] * 1000:8.1f} ms"
+        if baseline and baseline.get(key):
+            change = (summary[key] - baseline[key]) / baseline[key] * 100
+            line += f"  (baseline {baseline[key] * 1000:.1f} ms, {change:+.1f}%)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay webhook traffic for load testing.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    proxy_parser = subparsers.add_parser('proxy', help='Record or serve GitHub and OpenAI responses')
+    proxy_parser.add_argument('cassette', help='Cassette directory')
+    mode = proxy_parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--record', action='store_true', help='Forward requests upstream and record the responses')
+    mode.add_argument('--replay', action='store_true', help='Serve recorded responses')
+    proxy_parser.add_argument('--port', type=int, default=8900, help='Port to listen on')
+    proxy_parser.add_argument('--latency', action='store_true', help='Delay replayed responses by their recorded latency')
+    proxy_parser.add_argument('--speed', type=float, default=1.0, help='Divide replayed latencies by this factor')
+
+    replay_parser = subparsers.add_parser('replay', help='Send recorded webhook deliveries to the bot')
+    replay_parser.add_argument('cassette', help='Cassette directory')
+    replay_parser.add_argument('--target', default='http://localhost:3000/webhook', help='Webhook URL of the bot')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='Replay this many times faster than recorded')
+    replay_parser.add_argument('--workers', type=int, default=32, help='Deliveries in flight at once')
+    replay_parser.add_argument('--secret', default=WEBHOOK_SECRET, help='Re-sign deliveries with this webhook secret')
+    replay_parser.add_argument('--output', help='Write the summary as JSON to this file')
+    replay_parser.add_argument('--baseline', help="Compare with an earlier run's --output")
+
+    args = parser.parse_args()
+    load_dotenv()
+    if args.speed <= 0:
+        parser.error('--speed must be positive')
+
+    if args.command == 'proxy':
+        app = create_proxy(args.cassette, 'record' if args.record else 'replay', args.latency, args.speed)
+        app.run(host='0.0.0.0', port=args.port, threaded=True)
+        return
+
+    summary = replay_webhooks(args.cassette, args.target, args.speed, args.workers, args.secret)
+    if not summary['deliveries']:
+        return
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 import os
 import hmac
+import time
 import hashlib
 import logging
 from flask import Flask, request, jsonify
 from github_handler import GitHubHandler
 from ai_engine import AIEngine
-from config import WEBHOOK_SECRET, validate_config, GITHUB_TOKEN, AI_ENGINE
+from job_queue import JobQueue, ACCEPTED, DEFERRED, REJECTED, DUPLICATE
+from job_journal import JobJournal, new_worker_id
+from job_runner import run_job
+from issue_parser import fingerprint_issue
+from cassette import Cassette, WEBHOOKS_FILE
+from issue_writeback import IssueWriteBack
+from config import (
+    WEBHOOK_SECRET, validate_config, GITHUB_TOKEN, AI_ENGINE, AUTO_GENERATE_ACTIONS, PREWARM_CONTEXT,
+    MAX_IN_FLIGHT_JOBS, MAX_QUEUED_JOBS, OVERLOAD_POLICY, MAX_DEFERRED_JOBS, WEBHOOK_RETRY_AFTER,
+    JOB_JOURNAL_PATH, WORKER_MODE, JOB_LEASE_SECONDS, CASSETTE_DIR, REPOSITORY
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +26,18 @@ logger = logging.getLogger(__name__)
 github_handler = GitHubHandler(GITHUB_TOKEN)
 ai_engine = AIEngine(GITHUB_TOKEN)
 
+# Generation jobs run off the request thread, bounded so a burst of events cannot pile up LLM calls
+job_queue = JobQueue(MAX_IN_FLIGHT_JOBS, MAX_QUEUED_JOBS, OVERLOAD_POLICY, MAX_DEFERRED_JOBS, WEBHOOK_RETRY_AFTER)
+
+# Every job's completed steps, so a restart resumes instead of redoing them
+journal = JobJournal(JOB_JOURNAL_PATH, JOB_LEASE_SECONDS)
+
+# Deliveries recorded for load_test.py to replay, when CASSETTE_DIR is set
+webhook_cassette = Cassette(CASSETTE_DIR, WEBHOOKS_FILE) if CASSETTE_DIR else None
+
+# GitHub lists at most this many commits in a push payload
+MAX_PUSH_COMMITS = 2048
+
 # Track processed issues to prevent duplicates
 processed_issues = set()
 
@@ -39,6 +62,17 @@ def verify_webhook_signature(payload, signature):
 
 @app.route('/webhook', methods=['POST'])
 def handle_webhook():
+    if webhook_cassette is None:
+        return process_webhook()
+    started = time.time()
+    start = time.monotonic()
+    response = app.make_response(process_webhook())
+    webhook_cassette.record_webhook(
+        request.headers, request.get_data(), response.status_code, started, time.monotonic() - start
+    )
+    return response
+
+def process_webhook():
     try:
         # Verify webhook signature
         signature = request.headers.get('X-Hub-Signature-256')
@@ -49,67 +83,83 @@ def handle_webhook():
         payload = request.json
         event_type = request.headers.get('X-GitHub-Event')
 
+        status = None
         if event_type == 'issues':
-            handle_issue_event(payload)
+            status = handle_issue_event(payload)
         elif event_type == 'issue_comment':
-            handle_issue_comment(payload)
+            status = handle_issue_comment(payload)
+        elif event_type == 'push':
+            handle_push_event(payload)
         else:
             logger.info(f"Ignoring unsupported event type: {event_type}")
 
+        if status == REJECTED:
+            retry_after = job_queue.retry_after()
+            response = jsonify({'error': 'Too many jobs in progress', 'retry_after': retry_after})
+            return response, 503, {'Retry-After': str(retry_after)}
+        if status in (ACCEPTED, DEFERRED):
+            return jsonify({'status': status}), 202
+        if status == DUPLICATE:
+            # Already queued or running for this issue; this event adds nothing to it
+            repo_name = payload['repository']['full_name']
+            issue_number = payload['issue']['number']
+            job_id = journal.active_job_id(repo_name, issue_number)
+            logger.info(f"Issue #{issue_number} in {repo_name} already has a job in progress (job {job_id}), ignoring event")
+            return jsonify({'status': status, 'job_id': job_id}), 202
+
         return jsonify({'status': 'success'}), 200
 
     except Exception as e:
         logger.error(f"Error handling webhook: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def queue_stats():
+    """Job queue statistics: this process's queue inline, the shared job store in external mode."""
+    if WORKER_MODE != 'external':
+        return job_queue.stats()
+    stats = journal.stats()
+    stats['saturated'] = stats['pending'] >= MAX_QUEUED_JOBS
+    return stats
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up. Reports the job queue and per-model routing outcomes for monitoring."""
+    return jsonify({'status': 'ok', 'jobs': queue_stats(), 'routing': ai_engine.router.stats()}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 503 while the job queue is saturated, so a load balancer routes around this instance."""
+    stats = queue_stats()
+    if stats['saturated']:
+        return jsonify({'status': 'saturated', 'jobs': stats}), 503, {'Retry-After': str(job_queue.retry_after())}
+    return jsonify({'status': 'ready', 'jobs': stats}), 200
+
 def handle_issue_event(payload):
-    """Handle GitHub issue events."""
+    """Handle GitHub issue events, returning the job queue status if a job was submitted."""
     action = payload.get('action')
     issue = payload.get('issue')
     repository = payload.get('repository')
 
     if not all([action, issue, repository]):
         logger.error("Missing required fields in issue event payload")
-        return
+        return None
 
     repo_name = repository['full_name']
     issue_number = issue['number']
 
-    if action in ['opened', 'labeled']:
+    if action in ['opened', 'edited'] and action not in AUTO_GENERATE_ACTIONS and PREWARM_CONTEXT:
+        # Gather context now so a later /generate or label starts straight at the LLM call.
+        # External workers have their own caches, so there is nothing to warm here for them.
+        if WORKER_MODE != 'external' and not job_queue.saturated:
+            ai_engine.prewarm(repo_name, issue_number, prefetched={'issue': issue, 'repository': repository})
+
+    if action in AUTO_GENERATE_ACTIONS:
         logger.info(f"Processing issue #{issue_number} in {repo_name}")
-        
-        try:
-            # Generate code changes using AI
-            code_changes = ai_engine.generate_code(repo_name, issue_number)
-            
-            # Create PR with the changes
-            pr_url = github_handler.create_pr(
-                repo_name=repo_name,
-                issue_number=issue_number,
-                title=f"Fix for issue #{issue_number}",
-                body=code_changes['explanation'],
-                changes=code_changes['changes']
-            )
-            
-            logger.info(f"Created PR: {pr_url}")
-            
-            # Update issue with PR link
-            github_handler.update_issue(
-                repo_name=repo_name,
-                issue_number=issue_number,
-                comment=f"PR created: {pr_url}"
-            )
-
-        except Exception as e:
-            logger.error(f"Error processing issue: {str(e)}")
-            github_handler.update_issue(
-                repo_name=repo_name,
-                issue_number=issue_number,
-                comment=f"Error processing issue: {str(e)}"
-            )
+        return submit_job(repo_name, issue_number, issue, repository, 'issue')
+    return None
 
 def handle_issue_comment(payload):
-    """Handle GitHub issue comment events."""
+    """Handle GitHub issue comment events, returning the job queue status if a job was submitted."""
     action = payload.get('action')
     comment = payload.get('comment')
     issue = payload.get('issue')
@@ -117,41 +167,104 @@ def handle_issue_comment(payload):
 
     if not all([action, comment, issue, repository]):
         logger.error("Missing required fields in comment event payload")
-        return
+        return None
 
     if action == 'created' and comment['body'].startswith('/generate'):
         repo_name = repository['full_name']
         issue_number = issue['number']
-        
-        try:
-            # Generate code changes using AI
-            code_changes = ai_engine.generate_code(repo_name, issue_number)
-            
-            # Create PR with the changes
-            pr_url = github_handler.create_pr(
-                repo_name=repo_name,
-                issue_number=issue_number,
-                title=f"Fix for issue #{issue_number}",
-                body=code_changes['explanation'],
-                changes=code_changes['changes']
-            )
-            
-            logger.info(f"Created PR: {pr_url}")
-            
-            # Update issue with PR link
-            github_handler.update_issue(
-                repo_name=repo_name,
-                issue_number=issue_number,
-                comment=f"PR created: {pr_url}"
-            )
-
-        except Exception as e:
-            logger.error(f"Error processing comment: {str(e)}")
-            github_handler.update_issue(
-                repo_name=repo_name,
-                issue_number=issue_number,
-                comment=f"Error processing comment: {str(e)}"
-            )
+        return submit_job(repo_name, issue_number, issue, repository, 'comment')
+    return None
+
+def submit_job(repo_name, issue_number, issue, repository, source):
+    """
+    Queue generation for an issue, returning ACCEPTED, DEFERRED, REJECTED or DUPLICATE.
+
+    Inline, the job runs on this process's job queue. In external mode it is
+    only written to the journal for worker.py processes to claim, bounded by
+    the same queue limits.
+    """
+    if WORKER_MODE != 'external':
+        return job_queue.submit(
+            (repo_name, issue_number), generate_pr, repo_name, issue_number, issue, repository, source
+        )
+
+    pending = journal.stats()['pending']
+    if pending >= MAX_QUEUED_JOBS + (MAX_DEFERRED_JOBS if OVERLOAD_POLICY == 'defer' else 0):
+        logger.warning(f"Job store saturated ({pending} pending), rejected issue #{issue_number} in {repo_name}")
+        return REJECTED
+    job_id = journal.enqueue(
+        repo_name, issue_number, fingerprint_issue(issue), source, {'issue': issue, 'repository': repository}
+    )
+    if job_id is None:
+        return DUPLICATE
+    return DEFERRED if pending >= MAX_QUEUED_JOBS else ACCEPTED
+
+def generate_pr(repo_name, issue_number, issue, repository, source):
+    """Run generation for an issue in this process, resuming its unfinished journaled job if any."""
+    job = journal.open_job(
+        repo_name, issue_number, fingerprint_issue(issue), source,
+        {'issue': issue, 'repository': repository}, new_worker_id()
+    )
+    if job is None:
+        logger.info(f"Issue #{issue_number} in {repo_name} is already being processed by another worker")
+        return
+    run_job(job, ai_engine, github_handler)
+
+def resume_interrupted_jobs():
+    """Queue the jobs that were in progress when the server last stopped, or whose worker died."""
+    # A restart usually comes well within the lease, so the jobs the last
+    # process was running would otherwise not be claimable yet
+    released = journal.release_dead_leases()
+    if released:
+        logger.info(f"Released {released} job leases held by stopped processes")
+    while True:
+        job = journal.claim(new_worker_id())
+        if job is None:
+            return
+        logger.info(f"Resuming interrupted job {job.id} for issue #{job.issue_number} in {job.repo_name}")
+        if job_queue.submit((job.repo_name, job.issue_number), run_job, job, ai_engine, github_handler) != ACCEPTED:
+            # Leave it and the rest for the next start
+            journal.release(job.id)
+            return
+
+def changed_files(commits):
+    """
+    Fold the pushed commits' file lists into the net (changed, removed) path sets.
+
+    Commits are applied in order, so a file added and then removed counts as
+    removed, and one removed and then re-added as changed.
+    """
+    changed, removed = set(), set()
+    for commit in commits:
+        for path in commit.get('added', []) + commit.get('modified', []):
+            changed.add(path)
+            removed.discard(path)
+        for path in commit.get('removed', []):
+            removed.add(path)
+            changed.discard(path)
+    return changed, removed
+
+def handle_push_event(payload):
+    """Handle GitHub push events by invalidating the cache entries the push made stale."""
+    repository = payload.get('repository')
+    ref = payload.get('ref')
+    after = payload.get('after')
+
+    if not all([repository, ref, after]):
+        logger.error("Missing required fields in push event payload")
+        return
+
+    if ref != f"refs/heads/{repository.get('default_branch')}" or payload.get('deleted'):
+        # Only the default branch feeds the caches
+        return
+
+    repo_name = repository['full_name']
+    commits = payload.get('commits') or []
+    changed, removed = changed_files(commits)
+
+    # File lists are incomplete for force pushes and for very long pushes, so drop everything then
+    full = payload.get('forced') or payload.get('created') or len(commits) >= MAX_PUSH_COMMITS
+    ai_engine.apply_push(repo_name, payload.get('before'), after, changed, removed, full=bool(full))
 
 def process_issue(issue_number, title, body, is_urgent=False):
     """Process an issue and create a PR with AI-generated changes."""
@@ -216,9 +329,11 @@ Generated by Issue2PR Bot using {ai_engine.engine.upper()}
             body=pr_body
         )
         
-        # Update issue status
+        # Update issue status, with the job's other issue updates in one write each
         status = "PR Created ✅ (Urgent)" if is_urgent else "PR Created ✅"
-        github_handler.update_issue_status(issue_number, status)
+        writeback = IssueWriteBack(github_handler.github, REPOSITORY, issue_number)
+        writeback.label(status)
+        writeback.flush()
         
         logger.info(f"Successfully created PR #{pr.number} for issue #{issue_number}")
         
@@ -229,6 +344,10 @@ Generated by Issue2PR Bot using {ai_engine.engine.upper()}
 if __name__ == '__main__':
     # Validate configuration
     validate_config()
+
+    # Pick up jobs a previous run did not finish
+    if WORKER_MODE != 'external':
+        resume_interrupted_jobs()
     
     # Start the Flask application
     app.run(host='0.0.0.0', port=3000, debug=True) 
\ No newline at end of file
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    ROUTING_SMALL_LABELS, ROUTING_LARGE_LABELS, ROUTING_SMALL_MAX_BODY_CHARS, ROUTING_SMALL_MAX_FILES,
+    ROUTING_SMALL_MAX_DIFF_TOKENS
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 2000
+# Rough characters per token for code and prose
+CHARS_PER_TOKEN = 4
+# SEARCH/REPLACE edits restate only the changed regions, roughly this share of a file
+DIFF_EDIT_SHARE = 0.25
+# Tokens for the explanation, file list and considerations around the code
+RESPONSE_OVERHEAD_TOKENS = 400
+# Smallest budget given when the referenced files are known, so short fixes are not cut off
+MIN_TOKEN_BUDGET = 1000
+# Latencies kept per tier for the percentiles in stats()
+LATENCY_SAMPLES = 200
+
+SUCCESS = 'success'
+INVALID = 'invalid'
+ERROR = 'error'
+
+
+def parse_tiers(spec: str, default_backend: str = 'openai') -> List[Dict]:
+    """
+    Parse '[backend@]model[:max_tokens],...' (smallest first) into tier dicts.
+
+    Model names may contain colons themselves (Ollama's 'qwen2.5-coder:7b'),
+    so only a final all-digit part is read as max_tokens.
+    """
+    tiers = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        backend, _, model = item.rpartition('@')
+        backend = backend.strip() or default_backend
+        max_tokens = DEFAULT_MAX_TOKENS
+        head, _, tail = model.rpartition(':')
+        if head and tail.strip().isdigit():
+            model, max_tokens = head, int(tail)
+        model = model.strip()
+        tiers.append({'name': f"{backend}@{model}", 'backend': backend, 'model': model, 'max_tokens': max_tokens})
+    if not tiers:
+        raise ValueError("MODEL_TIERS must name at least one model")
+    return tiers
+
+
+def issue_features(issue_data: Dict, edit_format: str) -> Dict:
+    """
+    The issue features routing decides on.
+
+    Referenced files are the code context files the issue body names. The
+    diff estimate is the tokens the changes to them would take: the whole
+    files in 'whole' mode, a share of them in 'diff' mode.
+    """
+    issue = issue_data['issue']
+    body = issue['body'] or ''
+    code_context = issue_data['context']['code_context']
+    referenced = [path for path in code_context if path in body]
+    diff_tokens = sum(len(code_context[path]['content']) for path in referenced) / CHARS_PER_TOKEN
+    if edit_format == 'diff':
+        diff_tokens *= DIFF_EDIT_SHARE
+    return {
+        'labels': [label.lower() for label in issue['labels']],
+        'body_chars': len(issue['title']) + len(body),
+        'referenced_files': len(referenced),
+        'diff_tokens': int(diff_tokens),
+    }
+
+
+class ModelRouter:
+    """
+    Chooses the model tier and token budget for an issue and tracks how each tier performs.
+
+    Small issues (by label, body length, referenced files and estimated diff
+    size) start on the first tier and everything else on the second; tiers
+    past that are only reached by escalation when a tier's output fails
+    validation. Every attempt's latency and outcome is kept per tier and,
+    with a log path, appended as a JSON line for tuning the thresholds.
+    """
+
+    def __init__(self, tiers: List[Dict], log_path: Optional[str] = None):
+        self.tiers = tiers
+        self.log_path = log_path
+        self.stats_by_tier = {
+            tier['name']: {
+                'attempts': 0, SUCCESS: 0, INVALID: 0, ERROR: 0, 'latencies': deque(maxlen=LATENCY_SAMPLES)
+            }
+            for tier in tiers
+        }
+        self.lock = threading.Lock()
+        if log_path and os.path.dirname(log_path):
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    def is_small(self, features: Dict) -> bool:
+        labels = set(features['labels'])
+        if labels & set(ROUTING_LARGE_LABELS):
+            return False
+        fits = (features['referenced_files'] <= ROUTING_SMALL_MAX_FILES
+                and features['diff_tokens'] <= ROUTING_SMALL_MAX_DIFF_TOKENS)
+        if labels & set(ROUTING_SMALL_LABELS):
+            # A small label vouches for a long description, not for a large change
+            return fits
+        return fits and features['body_chars'] <= ROUTING_SMALL_MAX_BODY_CHARS
+
+    def route(self, issue_data: Dict, edit_format: str) -> Tuple[int, Dict]:
+        """Return the index of the tier to start on and the features it was chosen from."""
+        features = issue_features(issue_data, edit_format)
+        if len(self.tiers) == 1 or self.is_small(features):
+            return 0, features
+        return 1, features
+
+    def token_budget(self, tier: Dict, features: Dict) -> int:
+        """Room for the estimated diff with a margin, capped at the tier's max_tokens."""
+        if not features['referenced_files']:
+            # Nothing to estimate from
+            return tier['max_tokens']
+        estimate = int(features['diff_tokens'] * 1.5) + RESPONSE_OVERHEAD_TOKENS
+        return min(tier['max_tokens'], max(MIN_TOKEN_BUDGET, estimate))
+
+    def record(self, tier: Dict, features: Dict, max_tokens: int, outcome: str, latency: float,
+               candidates: int = 0) -> None:
+        """Count an attempt on a tier and append it to the routing log."""
+        with self.lock:
+            stats = self.stats_by_tier[tier['name']]
+            stats['attempts'] += 1
+            stats[outcome] += 1
+            stats['latencies'].append(latency)
+            if not self.log_path:
+                return
+            entry = {
+                'time': time.time(),
+                'backend': tier['backend'],
+                'model': tier['model'],
+                'max_tokens': max_tokens,
+                'outcome': outcome,
+                'latency': latency,
+                'candidates': candidates,
+                'features': features,
+            }
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError as e:
+                logger.error(f"Error writing routing log: {str(e)}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Attempts, success rate and latency percentiles per tier."""
+        with self.lock:
+            report = {}
+            for name, stats in self.stats_by_tier.items():
+                latencies = sorted(stats['latencies'])
+                report[name] = {
+                    'attempts': stats['attempts'],
+                    'success_rate': stats[SUCCESS] / stats['attempts'] if stats['attempts'] else None,
+                    'invalid': stats[INVALID],
+                    'errors': stats[ERROR],
+                    'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+                    'latency_p90': latencies[min(len(latencies) - 1, len(latencies) * 9 // 10)] if latencies else None,
+                }
+            return report
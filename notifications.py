@@ -0,0 +1,244 @@
+import time
+import queue
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import requests
+
+from config import (
+    SLACK_BOT_TOKEN, SLACK_CHANNEL, SLACK_API_URL, SLACK_MESSAGES_PER_SECOND,
+    DISCORD_BOT_TOKEN, DISCORD_CHANNEL, DISCORD_API_URL, DISCORD_MESSAGES_PER_SECOND,
+    NOTIFY_DIGEST_WINDOW, NOTIFY_MAX_RETRIES, NOTIFY_QUEUE_SIZE
+)
+from http_client import get_session
+from rate_limiter import RateLimiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Most events put in one digest; the rest go in the next one
+MAX_DIGEST_EVENTS = 50
+# First retry delay in seconds, doubled on each further attempt
+RETRY_BACKOFF = 1.0
+
+_lock = threading.Lock()
+_dispatcher = None
+
+
+class RetryableError(Exception):
+    """A send that failed in a way worth retrying (timeouts, 5xx, rate limits)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class NotificationChannel:
+    """One chat channel, with its own rate limiter; subclasses implement send()."""
+
+    name = 'channel'
+    max_chars = 2000
+
+    def __init__(self, messages_per_second: float):
+        self.limiter = RateLimiter(rate=messages_per_second, burst=1, reserve=0)
+
+    def send(self, text: str) -> None:
+        """Post text, raising RetryableError for failures worth retrying."""
+        raise NotImplementedError
+
+    def format(self, events: List[Dict]) -> str:
+        """One message for a digest of events, cut to the channel's length limit."""
+        if len(events) == 1:
+            text = events[0]['text']
+        else:
+            text = f"{len(events)} updates:\n" + '\n'.join(f"• {event['text']}" for event in events)
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars - 15] + '\n[... truncated]'
+        return text
+
+    def _post(self, url: str, headers: Dict, payload: Dict) -> requests.Response:
+        self.limiter.acquire()
+        try:
+            response = get_session().post(url, headers=headers, json=payload)
+        except requests.exceptions.RequestException as e:
+            raise RetryableError(str(e))
+        if response.status_code == 429:
+            retry_after = float(response.headers.get('Retry-After', RETRY_BACKOFF))
+            self.limiter.pause(retry_after)
+            raise RetryableError('rate limited', retry_after)
+        if response.status_code >= 500:
+            raise RetryableError(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        return response
+
+
+class SlackChannel(NotificationChannel):
+    """Posts with chat.postMessage on the Slack Web API."""
+
+    name = 'slack'
+    max_chars = 4000
+
+    def __init__(self, token: str, channel: str, api_url: str = SLACK_API_URL,
+                 messages_per_second: float = SLACK_MESSAGES_PER_SECOND):
+        super().__init__(messages_per_second)
+        self.token = token
+        self.channel = channel
+        self.api_url = api_url
+
+    def send(self, text: str) -> None:
+        response = self._post(
+            f"{self.api_url}/chat.postMessage",
+            {'Authorization': f"Bearer {self.token}"},
+            {'channel': self.channel, 'text': text}
+        )
+        # Slack reports most errors in the body of a 200 response
+        body = response.json()
+        if not body.get('ok'):
+            if body.get('error') == 'ratelimited':
+                raise RetryableError('rate limited')
+            raise ValueError(f"Slack error: {body.get('error')}")
+
+
+class DiscordChannel(NotificationChannel):
+    """Posts to a channel through the Discord REST API."""
+
+    name = 'discord'
+    max_chars = 2000
+
+    def __init__(self, token: str, channel_id: str, api_url: str = DISCORD_API_URL,
+                 messages_per_second: float = DISCORD_MESSAGES_PER_SECOND):
+        super().__init__(messages_per_second)
+        self.token = token
+        self.channel_id = channel_id
+        self.api_url = api_url
+
+    def send(self, text: str) -> None:
+        response = self._post(
+            f"{self.api_url}/channels/{self.channel_id}/messages",
+            {'Authorization': f"Bot {self.token}"},
+            {'content': text}
+        )
+        # Wait out the bucket rather than spend the next request on a 429
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            self.limiter.pause(float(response.headers.get('X-RateLimit-Reset-After', RETRY_BACKOFF)))
+
+
+class NotificationDispatcher:
+    """
+    Sends job events to chat channels without making the job wait.
+
+    publish() only enqueues, and drops the event if a channel's queue is
+    full. Each channel has its own worker thread that gathers the events
+    arriving within the digest window into one message and sends it under
+    the channel's rate limit, retrying with backoff. A slow or failing chat
+    API therefore only delays that channel's digests.
+    """
+
+    def __init__(self, channels: List[NotificationChannel], window: float = NOTIFY_DIGEST_WINDOW,
+                 max_retries: int = NOTIFY_MAX_RETRIES, max_queued: int = NOTIFY_QUEUE_SIZE):
+        self.channels = channels
+        self.window = window
+        self.max_retries = max_retries
+        self.queues = {channel.name: queue.Queue(maxsize=max_queued) for channel in channels}
+        self.stopping = threading.Event()
+        self.stats = {channel.name: {'sent': 0, 'failed': 0, 'dropped': 0} for channel in channels}
+        self.threads = [
+            threading.Thread(target=self._run, args=(channel,), name=f'notify-{channel.name}', daemon=True)
+            for channel in channels
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def publish(self, text: str, **fields) -> None:
+        """Queue an event for every channel; never blocks."""
+        event = dict(fields, text=text, time=time.time())
+        for name, events in self.queues.items():
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                self.stats[name]['dropped'] += 1
+                logger.warning(f"Notification queue for {name} is full, dropping event")
+
+    def _collect(self, events: queue.Queue) -> List[Dict]:
+        """Wait for an event, then gather those that arrive within the window after it."""
+        try:
+            digest = [events.get(timeout=1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(digest) < MAX_DIGEST_EVENTS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stopping.is_set():
+                # Take what is already queued without waiting further
+                try:
+                    digest.append(events.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                digest.append(events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return digest
+
+    def _run(self, channel: NotificationChannel) -> None:
+        events = self.queues[channel.name]
+        while not (self.stopping.is_set() and events.empty()):
+            digest = self._collect(events)
+            if digest:
+                self._deliver(channel, digest)
+
+    def _deliver(self, channel: NotificationChannel, digest: List[Dict]) -> None:
+        text = channel.format(digest)
+        for attempt in range(self.max_retries + 1):
+            try:
+                channel.send(text)
+                self.stats[channel.name]['sent'] += len(digest)
+                return
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Error sending {len(digest)} events to {channel.name}: {str(e)}")
+                    break
+                delay = e.retry_after or RETRY_BACKOFF * 2 ** attempt
+                logger.warning(f"Sending to {channel.name} failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception as e:
+                logger.error(f"Error sending {len(digest)} events to {channel.name}: {str(e)}")
+                break
+        self.stats[channel.name]['failed'] += len(digest)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Send what is queued, without waiting for the digest window, then stop the workers."""
+        self.stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+def configured_channels() -> List[NotificationChannel]:
+    """The channels whose bot token and channel are configured."""
+    channels = []
+    if SLACK_BOT_TOKEN and SLACK_CHANNEL:
+        channels.append(SlackChannel(SLACK_BOT_TOKEN, SLACK_CHANNEL))
+    if DISCORD_BOT_TOKEN and DISCORD_CHANNEL:
+        channels.append(DiscordChannel(DISCORD_BOT_TOKEN, DISCORD_CHANNEL))
+    return channels
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    """Return the process-wide dispatcher for the configured channels, creating it on first use."""
+    global _dispatcher
+    with _lock:
+        if _dispatcher is None:
+            channels = configured_channels()
+            _dispatcher = NotificationDispatcher(channels)
+            if channels:
+                logger.info(f"Sending notifications to {', '.join(channel.name for channel in channels)}")
+        return _dispatcher
+
+
+def notify(text: str, **fields) -> None:
+    """Publish a job event to the configured chat channels without waiting for delivery."""
+    get_dispatcher().publish(text, **fields)
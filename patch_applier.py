@@ -0,0 +1,158 @@
+import re
+import logging
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEARCH_MARKER = re.compile(r'^<{5,9} SEARCH\s*$')
+DIVIDER_MARKER = re.compile(r'^={5,9}\s*$')
+REPLACE_MARKER = re.compile(r'^>{5,9} REPLACE\s*$')
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# Minimum similarity for a fuzzy match of a hunk against the file
+FUZZY_THRESHOLD = 0.8
+
+
+class PatchError(Exception):
+    """Raised when an edit cannot be located in, or applied to, the base file."""
+
+
+def parse_search_replace(text: str) -> List[Tuple[str, str]]:
+    """Parse SEARCH/REPLACE blocks into (search, replace) pairs."""
+    blocks = []
+    search: Optional[List[str]] = None
+    replace: Optional[List[str]] = None
+    for line in text.splitlines():
+        if SEARCH_MARKER.match(line):
+            search, replace = [], None
+        elif DIVIDER_MARKER.match(line) and search is not None and replace is None:
+            replace = []
+        elif REPLACE_MARKER.match(line) and replace is not None:
+            blocks.append(('\n'.join(search), '\n'.join(replace)))
+            search, replace = None, None
+        elif replace is not None:
+            replace.append(line)
+        elif search is not None:
+            search.append(line)
+    if search is not None:
+        raise PatchError("Unterminated SEARCH/REPLACE block")
+    return blocks
+
+
+def parse_unified_diff(text: str) -> List[Tuple[int, str, str]]:
+    """
+    Parse unified diff hunks into (old start line, old text, new text) triples.
+
+    Lines within a hunk's declared line counts are always hunk lines, so a
+    removed line reading '-- x' is not mistaken for a '---' file header.
+    Past the counts, file headers are skipped; other lines still count
+    toward the hunk, since generated diffs often get the counts wrong.
+    """
+    hunks = []
+    current = None
+    old_left = new_left = 0
+    for line in text.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+            old_left = int(header.group(2) or 1)
+            new_left = int(header.group(4) or 1)
+            continue
+        if line.startswith('\\'):
+            # "\ No newline at end of file"
+            continue
+        in_counts = old_left > 0 or new_left > 0
+        if current is None or not in_counts and line.startswith(('---', '+++', 'diff ', 'index ')):
+            continue
+        marker, content = (line[0], line[1:]) if line else (' ', '')
+        if marker in (' ', '-'):
+            current[1].append(content)
+            old_left -= 1
+        if marker in (' ', '+'):
+            current[2].append(content)
+            new_left -= 1
+    return [(start, '\n'.join(old), '\n'.join(new)) for start, old, new in hunks]
+
+
+def _find_block(lines: List[str], block: List[str], hint: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    Locate block in lines, returning the (start, end) line slice.
+
+    Tries an exact match, then a match ignoring surrounding whitespace, then
+    the most similar window of the same length. Ties are broken by distance
+    from hint.
+    """
+    size = len(block)
+    if size == 0 or size > len(lines):
+        return None
+    starts = sorted(range(len(lines) - size + 1), key=lambda start: abs(start - hint))
+
+    for start in starts:
+        if lines[start:start + size] == block:
+            return start, start + size
+
+    stripped = [line.strip() for line in block]
+    for start in starts:
+        if [line.strip() for line in lines[start:start + size]] == stripped:
+            return start, start + size
+
+    target = '\n'.join(stripped)
+    best_ratio, best_start = 0.0, None
+    for start in starts:
+        candidate = '\n'.join(line.strip() for line in lines[start:start + size])
+        matcher = SequenceMatcher(None, candidate, target, autojunk=False)
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best_ratio, best_start = ratio, start
+    if best_start is not None and best_ratio >= FUZZY_THRESHOLD:
+        logger.info(f"Fuzzy-matched edit at line {best_start + 1} (similarity {best_ratio:.2f})")
+        return best_start, best_start + size
+    return None
+
+
+def _replace(original: str, search: str, replace: str, hint: int = 0) -> str:
+    """Replace the region matching search with replace."""
+    if not search.strip():
+        # An empty search means the file is created (or appended to)
+        return f"{original}{replace}\n" if not original or original.endswith('\n') else f"{original}\n{replace}\n"
+
+    lines = original.splitlines()
+    match = _find_block(lines, search.splitlines(), hint)
+    if match is None:
+        preview = search.strip().splitlines()[0]
+        raise PatchError(f"Could not locate edit starting with: {preview[:80]}")
+    start, end = match
+    result = lines[:start] + replace.splitlines() + lines[end:]
+    return '\n'.join(result) + ('\n' if original.endswith('\n') or not original else '')
+
+
+def apply_search_replace(original: str, blocks: List[Tuple[str, str]]) -> str:
+    """Apply (search, replace) pairs in order."""
+    for search, replace in blocks:
+        original = _replace(original, search, replace)
+    return original
+
+
+def apply_unified_diff(original: str, diff_text: str) -> str:
+    """Apply a unified diff, locating each hunk by its context with fuzzy matching."""
+    offset = 0
+    for start, old, new in parse_unified_diff(diff_text):
+        before = len(original.splitlines())
+        original = _replace(original, old, new, hint=max(start - 1 + offset, 0))
+        offset += len(original.splitlines()) - before
+    return original
+
+
+def apply_edits(original: str, edit_text: str) -> str:
+    """Apply an edit in either SEARCH/REPLACE or unified diff format."""
+    if any(SEARCH_MARKER.match(line) for line in edit_text.splitlines()):
+        return apply_search_replace(original, parse_search_replace(edit_text))
+    if any(HUNK_HEADER.match(line) for line in edit_text.splitlines()):
+        return apply_unified_diff(original, edit_text)
+    raise PatchError("Edit contains neither SEARCH/REPLACE blocks nor unified diff hunks")
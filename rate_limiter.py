@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+from typing import Mapping, Optional
+
+from config import GITHUB_REQUESTS_PER_SECOND, GITHUB_RATE_LIMIT_RESERVE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that also honours GitHub's rate limit headers.
+
+    Callers acquire() before each request and observe() the response headers
+    afterwards. When the primary limit runs down to the reserve, or GitHub
+    answers with Retry-After (secondary limits), every caller pauses until the
+    limit resets instead of burning requests on errors.
+    """
+
+    def __init__(self, rate: float = GITHUB_REQUESTS_PER_SECOND, burst: Optional[int] = None,
+                 reserve: int = GITHUB_RATE_LIMIT_RESERVE):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.reserve = reserve
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Stop all callers for the given number of seconds."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limit reached, pausing requests for {seconds:.0f}s")
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Update the limiter from a response's rate limit headers."""
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            self.pause(float(retry_after))
+            return
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset is not None and int(remaining) <= self.reserve:
+            self.pause(max(0.0, int(reset) - time.time()) + 1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
@@ -4,20 +4,34 @@ GitHub Issue Analysis Script
 
 This script analyzes GitHub issues and generates reports about:
 - Issue distribution by label
-- Average time to resolution
+- Time to resolution and time to first response (mean and percentiles)
 - Issue types and patterns
 - Open vs. closed issue ratio
+
+Several repositories, or every repository in an organization, can be
+analyzed in parallel processes; their results are merged into one report.
 """
 
 import os
+import sys
 import json
+import sqlite3
+import argparse
+import multiprocessing
 import requests
 from datetime import datetime
 from collections import Counter
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 import logging
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_client import get_session, github_headers
+from quantile_sketch import DDSketch
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,28 +44,412 @@ load_dotenv()
 
 # Configuration
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
-REPO_OWNER = os.getenv('REPOSITORY').split('/')[0]
-REPO_NAME = os.getenv('REPOSITORY').split('/')[1]
-API_URL = f'https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/issues'
-HEADERS = {
-    'Authorization': f'token {GITHUB_TOKEN}',
-    'Accept': 'application/vnd.github.v3+json'
-}
-
-def get_issues() -> List[Dict]:
-    """Fetch all issues from the repository."""
+REPOSITORY = os.getenv('REPOSITORY')
+API_URL = 'https://api.github.com'
+HEADERS = github_headers(GITHUB_TOKEN)
+PAGE_PARAMS = {'state': 'all', 'per_page': 100, 'sort': 'created', 'direction': 'asc'}
+MAX_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '8'))
+MAX_PROCESSES = int(os.getenv('ANALYSIS_PROCESSES', str(os.cpu_count() or 1)))
+STATE_DIR = os.getenv('ANALYSIS_STATE_DIR', '.issue_analysis')
+SKETCH_ACCURACY = 0.01
+PERCENTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+# Bumped whenever the shape of saved contributions changes
+STATE_VERSION = '2'
+
+def _parse_time(timestamp: str) -> datetime:
+    return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+
+def _last_page(response: requests.Response) -> Optional[int]:
+    """Return the page number of the last page advertised in the Link header."""
+    last_url = response.links.get('last', {}).get('url')
+    if not last_url:
+        return None
+    return int(parse_qs(urlparse(last_url).query)['page'][0])
+
+def _fetch_page(repo: str, page: int, since: Optional[str] = None) -> requests.Response:
+    """Fetch a single page of issues, optionally only those updated since a timestamp."""
+    params = dict(PAGE_PARAMS, page=page)
+    if since:
+        params['since'] = since
+    response = get_session().get(f'{API_URL}/repos/{repo}/issues', headers=HEADERS, params=params)
+    response.raise_for_status()
+    return response
+
+def _first_response_at(issue: Dict) -> Optional[str]:
+    """
+    Return when someone other than the author first commented on the issue.
+
+    Only the first page of comments is inspected, which covers all but the
+    most heavily self-commented issues.
+    """
+    if not issue.get('comments'):
+        return None
+    response = get_session().get(issue['comments_url'], headers=HEADERS, params={'per_page': 100})
+    response.raise_for_status()
+    author = (issue.get('user') or {}).get('login')
+    for comment in response.json():
+        if (comment.get('user') or {}).get('login') != author:
+            return comment['created_at']
+    return None
+
+def add_first_responses(issues: List[Dict]) -> None:
+    """Look up first-response times for the commented issues, MAX_WORKERS at a time."""
+    commented = [issue for issue in issues if issue.get('comments')]
+    if not commented:
+        return
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for issue, first_response_at in zip(commented, executor.map(_first_response_at, commented)):
+            issue['first_response_at'] = first_response_at
+
+def _prepare_issues(items: List[Dict]) -> List[Dict]:
+    """Drop pull requests, which the issues endpoint also returns."""
+    return [item for item in items if 'pull_request' not in item]
+
+def _load_page(repo: str, page: int, since: Optional[str]) -> List[Dict]:
+    return _prepare_issues(_fetch_page(repo, page, since).json())
+
+def iter_issue_pages(repo: str, since: Optional[str] = None) -> Iterator[List[Dict]]:
+    """
+    Stream every page of issues from the repository.
+
+    If since is given, only issues updated at or after that ISO 8601
+    timestamp are returned.
+
+    Once the first response reveals the total page count, the remaining pages
+    are fetched concurrently with at most MAX_WORKERS pages in flight, so
+    memory stays bounded regardless of repository size.
+    """
     try:
-        response = requests.get(API_URL, headers=HEADERS)
-        response.raise_for_status()
-        return response.json()
+        first = _fetch_page(repo, 1, since)
+        yield _prepare_issues(first.json())
+
+        last_page = _last_page(first)
+        if last_page is None:
+            # No page count advertised; follow next links one at a time
+            next_url = first.links.get('next', {}).get('url')
+            while next_url:
+                response = get_session().get(next_url, headers=HEADERS)
+                response.raise_for_status()
+                yield _prepare_issues(response.json())
+                next_url = response.links.get('next', {}).get('url')
+            return
+
+        remaining = iter(range(2, last_page + 1))
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            pending = {
+                executor.submit(_load_page, repo, page, since)
+                for page in islice(remaining, MAX_WORKERS)
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    next_page = next(remaining, None)
+                    if next_page is not None:
+                        pending.add(executor.submit(_load_page, repo, next_page, since))
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching issues: {str(e)}")
+        logger.error(f"Error fetching issues for {repo}: {str(e)}")
         raise
 
-def analyze_issues(issues: List[Dict]) -> Tuple[Dict, float, Dict, float]:
+def iter_issues(repo: str, first_response: bool = False) -> Iterator[Dict]:
+    """Stream every issue (excluding pull requests) from the repository."""
+    for page in iter_issue_pages(repo):
+        if first_response:
+            add_first_responses(page)
+        yield from page
+
+def list_org_repositories(org: str) -> List[str]:
+    """List the full names of all non-archived repositories in an organization."""
+    repos = []
+    url = f'{API_URL}/orgs/{org}/repos'
+    params = {'per_page': 100, 'type': 'all'}
+    try:
+        while url:
+            response = get_session().get(url, headers=HEADERS, params=params)
+            response.raise_for_status()
+            repos.extend(repo['full_name'] for repo in response.json() if not repo.get('archived'))
+            url = response.links.get('next', {}).get('url')
+            params = None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error listing repositories for {org}: {str(e)}")
+        raise
+    return repos
+
+class IssueStats:
+    """Running aggregates over a stream of issues."""
+
+    def __init__(self):
+        self.label_counts = Counter()
+        self.issue_types = Counter()
+        self.open_count = 0
+        self.closed_count = 0
+        self.resolve_time_total = 0
+        self.resolved_count = 0
+        self.resolve_times = DDSketch(SKETCH_ACCURACY)
+        self.first_response_times = DDSketch(SKETCH_ACCURACY)
+
+    @staticmethod
+    def contribution(issue: Dict) -> Dict:
+        """Reduce an issue to the fields it contributes to the aggregates."""
+        label_names = [label['name'] for label in issue['labels']]
+        created_at = _parse_time(issue['created_at'])
+        resolve_seconds = None
+        first_response_seconds = None
+
+        # Calculate resolution time
+        if issue['closed_at']:
+            resolve_seconds = (_parse_time(issue['closed_at']) - created_at).total_seconds()
+
+        # Calculate time to first response
+        if issue.get('first_response_at'):
+            first_response_seconds = (_parse_time(issue['first_response_at']) - created_at).total_seconds()
+
+        return {
+            'labels': label_names,
+            'type': issue_type(label_names),
+            'closed': bool(issue['closed_at']),
+            'resolve_seconds': resolve_seconds,
+            'first_response_seconds': first_response_seconds
+        }
+
+    def apply(self, contribution: Dict, sign: int = 1) -> None:
+        """Add (sign=1) or retract (sign=-1) a single issue's contribution."""
+        for name in contribution['labels']:
+            self.label_counts[name] += sign
+        self.issue_types[contribution['type']] += sign
+
+        if contribution['closed']:
+            self.closed_count += sign
+        else:
+            self.open_count += sign
+
+        if contribution['resolve_seconds'] is not None:
+            self.resolve_time_total += sign * contribution['resolve_seconds']
+            self.resolved_count += sign
+            self.resolve_times.add(max(contribution['resolve_seconds'], 0), sign)
+
+        if contribution['first_response_seconds'] is not None:
+            self.first_response_times.add(max(contribution['first_response_seconds'], 0), sign)
+
+    def add(self, issue: Dict) -> None:
+        """Fold a single issue into the aggregates."""
+        self.apply(self.contribution(issue))
+
+    def merge(self, other: 'IssueStats') -> None:
+        """Fold another repository's aggregates into these."""
+        self.label_counts.update(other.label_counts)
+        self.issue_types.update(other.issue_types)
+        self.open_count += other.open_count
+        self.closed_count += other.closed_count
+        self.resolve_time_total += other.resolve_time_total
+        self.resolved_count += other.resolved_count
+        self.resolve_times.merge(other.resolve_times)
+        self.first_response_times.merge(other.first_response_times)
+
+    @property
+    def total(self) -> int:
+        return self.open_count + self.closed_count
+
+    @property
+    def average_resolve_time(self) -> float:
+        """Mean resolution time in days."""
+        return self.resolve_time_total / self.resolved_count / 86400 if self.resolved_count else 0
+
+    @property
+    def open_ratio(self) -> float:
+        return self.open_count / self.total if self.total > 0 else 0
+
+    @staticmethod
+    def _percentiles(sketch: DDSketch, unit_seconds: int) -> Dict[str, Optional[float]]:
+        result = {}
+        for name, q in PERCENTILES.items():
+            value = sketch.quantile(q)
+            result[name] = value / unit_seconds if value is not None else None
+        return result
+
+    def resolve_time_percentiles(self) -> Dict[str, Optional[float]]:
+        """Resolution time percentiles in days."""
+        return self._percentiles(self.resolve_times, 86400)
+
+    def first_response_percentiles(self) -> Dict[str, Optional[float]]:
+        """Time to first response percentiles in hours."""
+        return self._percentiles(self.first_response_times, 3600)
+
+    def to_dict(self) -> Dict:
+        """Serialize the aggregates for persistence or transfer between processes."""
+        # Unary + drops the entries that retractions brought back to zero
+        return {
+            'label_counts': dict(+self.label_counts),
+            'issue_types': dict(+self.issue_types),
+            'open_count': self.open_count,
+            'closed_count': self.closed_count,
+            'resolve_time_total': self.resolve_time_total,
+            'resolved_count': self.resolved_count,
+            'resolve_times': self.resolve_times.to_dict(),
+            'first_response_times': self.first_response_times.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'IssueStats':
+        """Restore aggregates saved by to_dict."""
+        stats = cls()
+        stats.label_counts.update(data['label_counts'])
+        stats.issue_types.update(data['issue_types'])
+        stats.open_count = data['open_count']
+        stats.closed_count = data['closed_count']
+        stats.resolve_time_total = data['resolve_time_total']
+        stats.resolved_count = data['resolved_count']
+        stats.resolve_times = DDSketch.from_dict(data['resolve_times'])
+        stats.first_response_times = DDSketch.from_dict(data['first_response_times'])
+        return stats
+
+class AnalysisState:
+    """
+    On-disk aggregates, per-issue contributions and the updated_at high-water mark.
+
+    Per-issue contributions are kept so that an issue that changed since the
+    last run can have its old contribution retracted before the new one is
+    applied. All changes from a run are committed in a single transaction, so
+    an interrupted run leaves the previous state intact.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS issues (number INTEGER PRIMARY KEY, contribution TEXT)')
+        self.conn.commit()
+
+        if self._get_meta('version') != STATE_VERSION:
+            # Saved contributions from an older layout cannot be retracted safely
+            self.reset()
+
+    @staticmethod
+    def path_for(repo: str) -> str:
+        """Return the default state file for a repository."""
+        return os.path.join(STATE_DIR, f"{repo.replace('/', '__')}.db")
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    @property
+    def high_water_mark(self) -> Optional[str]:
+        return self._get_meta('high_water_mark')
+
+    def load_stats(self) -> IssueStats:
+        """Load the saved aggregates, or empty ones if nothing was saved yet."""
+        data = self._get_meta('aggregates')
+        return IssueStats.from_dict(json.loads(data)) if data else IssueStats()
+
+    def get_contribution(self, number: int) -> Optional[Dict]:
+        row = self.conn.execute('SELECT contribution FROM issues WHERE number = ?', (number,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_contribution(self, number: int, contribution: Dict) -> None:
+        self.conn.execute(
+            'INSERT OR REPLACE INTO issues (number, contribution) VALUES (?, ?)',
+            (number, json.dumps(contribution))
+        )
+
+    def save(self, stats: IssueStats, high_water_mark: Optional[str]) -> None:
+        """Persist the aggregates and high-water mark, committing the run."""
+        self._set_meta('aggregates', json.dumps(stats.to_dict()))
+        if high_water_mark:
+            self._set_meta('high_water_mark', high_water_mark)
+        self.conn.commit()
+
+    def reset(self) -> None:
+        """Discard all saved state."""
+        self.conn.execute('DELETE FROM meta')
+        self.conn.execute('DELETE FROM issues')
+        self._set_meta('version', STATE_VERSION)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+def update_stats(state: AnalysisState, repo: str, first_response: bool = False) -> IssueStats:
+    """
+    Bring the saved aggregates up to date.
+
+    Only issues updated since the saved high-water mark are fetched. Each one
+    has its previous contribution (if any) retracted and its current one
+    applied. A first response, once seen, does not change, so with
+    first_response comments are only looked up for issues that have none
+    saved yet; a saved one is carried over either way.
+    """
+    stats = state.load_stats()
+    since = state.high_water_mark
+    high_water_mark = since
+    updated = 0
+
+    if since:
+        logger.info(f"Fetching issues in {repo} updated since {since}")
+    else:
+        logger.info(f"No saved state for {repo}, fetching full issue history")
+
+    for page in iter_issue_pages(repo, since=since):
+        previous_by_number = {issue['number']: state.get_contribution(issue['number']) for issue in page}
+        if first_response:
+            add_first_responses([
+                issue for issue in page
+                if (previous_by_number[issue['number']] or {}).get('first_response_seconds') is None
+            ])
+        for issue in page:
+            previous = previous_by_number[issue['number']]
+            if previous:
+                stats.apply(previous, sign=-1)
+            contribution = IssueStats.contribution(issue)
+            if previous and contribution['first_response_seconds'] is None:
+                contribution['first_response_seconds'] = previous['first_response_seconds']
+            stats.apply(contribution)
+            state.put_contribution(issue['number'], contribution)
+
+            if high_water_mark is None or issue['updated_at'] > high_water_mark:
+                high_water_mark = issue['updated_at']
+            updated += 1
+
+    state.save(stats, high_water_mark)
+    logger.info(f"Applied {updated} new or updated issues for {repo}")
+    return stats
+
+def analyze_repository(repo: str, full: bool = False, first_response: bool = False) -> Dict:
+    """
+    Update and return one repository's aggregates as a plain dict.
+
+    This is the unit of work handed to worker processes, so it takes and
+    returns only picklable values.
+    """
+    state = AnalysisState(AnalysisState.path_for(repo))
+    try:
+        if full:
+            state.reset()
+        return update_stats(state, repo, first_response).to_dict()
+    finally:
+        state.close()
+
+def issue_type(label_names: List[str]) -> str:
+    """Classify an issue by its labels."""
+    lowered = [name.lower() for name in label_names]
+    for known_type in ('bug', 'enhancement', 'question'):
+        if known_type in lowered:
+            return known_type
+    return 'other'
+
+def analyze_issues(issues: Iterable[Dict]) -> Tuple[Dict, float, Dict, float]:
     """
     Analyze GitHub issues and return statistics.
-    
+
+    The issues are consumed as a stream, so any iterable (including
+    iter_issues()) can be passed without materialising it.
+
     Returns:
         Tuple containing:
         - Label counts
@@ -59,82 +457,117 @@ def analyze_issues(issues: List[Dict]) -> Tuple[Dict, float, Dict, float]:
         - Issue type distribution
         - Open vs. closed ratio
     """
-    label_counts = Counter()
-    resolve_times = []
-    issue_types = Counter()
-    open_count = 0
-    closed_count = 0
-    
+    stats = IssueStats()
     for issue in issues:
-        # Count labels
-        for label in issue['labels']:
-            label_counts[label['name']] += 1
-        
-        # Determine issue type
-        if 'bug' in [label['name'].lower() for label in issue['labels']]:
-            issue_types['bug'] += 1
-        elif 'enhancement' in [label['name'].lower() for label in issue['labels']]:
-            issue_types['enhancement'] += 1
-        elif 'question' in [label['name'].lower() for label in issue['labels']]:
-            issue_types['question'] += 1
-        else:
-            issue_types['other'] += 1
-        
-        # Calculate resolution time
-        if issue['closed_at']:
-            closed_count += 1
-            open_time = datetime.strptime(issue['created_at'], "%Y-%m-%dT%H:%M:%SZ")
-            close_time = datetime.strptime(issue['closed_at'], "%Y-%m-%dT%H:%M:%SZ")
-            resolve_times.append((close_time - open_time).days)
-        else:
-            open_count += 1
-    
-    avg_resolve_time = sum(resolve_times) / len(resolve_times) if resolve_times else 0
-    total_issues = open_count + closed_count
-    open_ratio = (open_count / total_issues) if total_issues > 0 else 0
-    
-    return label_counts, avg_resolve_time, issue_types, open_ratio
-
-def generate_report() -> None:
-    """Generate and save the analysis report."""
+        stats.add(issue)
+    return stats.label_counts, stats.average_resolve_time, stats.issue_types, stats.open_ratio
+
+def analyze_repositories(repos: List[str], full: bool = False, first_response: bool = False) -> Dict[str, IssueStats]:
+    """Analyze several repositories in parallel processes and return their aggregates."""
+    results = {}
+    if len(repos) == 1:
+        results[repos[0]] = IssueStats.from_dict(analyze_repository(repos[0], full, first_response))
+        return results
+
+    # Spawn rather than fork so workers never inherit the parent's open connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(MAX_PROCESSES, len(repos)), mp_context=context) as executor:
+        futures = {
+            executor.submit(analyze_repository, repo, full, first_response): repo
+            for repo in repos
+        }
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                results[repo] = IssueStats.from_dict(future.result())
+            except Exception as e:
+                logger.error(f"Error analyzing {repo}: {str(e)}")
+    return results
+
+def build_report(stats: IssueStats) -> Dict:
+    """Build the report section for one set of aggregates."""
+    return {
+        'label_counts': dict(stats.label_counts),
+        'average_resolve_time': stats.average_resolve_time,
+        'resolve_time_percentiles_days': stats.resolve_time_percentiles(),
+        'first_response_percentiles_hours': stats.first_response_percentiles(),
+        'issue_types': dict(stats.issue_types),
+        'open_ratio': stats.open_ratio,
+        'total_issues': stats.total
+    }
+
+def _format_percentiles(percentiles: Dict[str, Optional[float]], unit: str) -> str:
+    return ', '.join(
+        f'{name} {value:.1f} {unit}' if value is not None else f'{name} n/a'
+        for name, value in percentiles.items()
+    )
+
+def print_report(title: str, stats: IssueStats) -> None:
+    """Print one set of aggregates."""
+    print(f'\n{title}')
+    print('=' * 30)
+    print(f'Total Issues: {stats.total}')
+    print(f'Open Issues Ratio: {stats.open_ratio:.2%}')
+    print(f'Average Resolution Time: {stats.average_resolve_time:.1f} days')
+    print(f'Resolution Time: {_format_percentiles(stats.resolve_time_percentiles(), "days")}')
+    print(f'First Response Time: {_format_percentiles(stats.first_response_percentiles(), "hours")}')
+
+    print('\nLabel Distribution:')
+    for label, count in stats.label_counts.most_common():
+        print(f'  - {label}: {count}')
+
+    print('\nIssue Types:')
+    for issue_type_name, count in stats.issue_types.most_common():
+        print(f'  - {issue_type_name}: {count}')
+
+def generate_report(repos: List[str], full: bool = False, first_response: bool = False) -> None:
+    """Generate and save the analysis report, updating the saved state incrementally."""
     try:
-        issues = get_issues()
-        label_counts, avg_resolve_time, issue_types, open_ratio = analyze_issues(issues)
-        
+        results = analyze_repositories(repos, full, first_response)
+
+        overall = IssueStats()
+        for stats in results.values():
+            overall.merge(stats)
+
         # Create report
-        report = {
-            'label_counts': dict(label_counts),
-            'average_resolve_time': avg_resolve_time,
-            'issue_types': dict(issue_types),
-            'open_ratio': open_ratio,
-            'total_issues': len(issues),
-            'generated_at': datetime.now().isoformat()
-        }
-        
+        report = build_report(overall)
+        if len(repos) > 1:
+            report['repositories'] = {repo: build_report(stats) for repo, stats in sorted(results.items())}
+        report['generated_at'] = datetime.now().isoformat()
+
         # Print report
-        print('\nGitHub Issue Analysis Report')
-        print('=' * 30)
-        print(f'Total Issues: {len(issues)}')
-        print(f'Open Issues Ratio: {open_ratio:.2%}')
-        print(f'Average Resolution Time: {avg_resolve_time:.1f} days')
-        
-        print('\nLabel Distribution:')
-        for label, count in label_counts.most_common():
-            print(f'  - {label}: {count}')
-        
-        print('\nIssue Types:')
-        for issue_type, count in issue_types.most_common():
-            print(f'  - {issue_type}: {count}')
-        
+        if len(repos) > 1:
+            for repo, stats in sorted(results.items()):
+                print_report(f'{repo} Issue Analysis', stats)
+            print_report(f'Combined Issue Analysis ({len(results)} repositories)', overall)
+        else:
+            print_report('GitHub Issue Analysis Report', overall)
+
         # Save report
         with open('issue_analysis_report.json', 'w') as f:
             json.dump(report, f, indent=2)
-        
+
         logger.info('Report generated successfully')
-        
+
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    generate_report() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Analyze GitHub issues and generate a report.')
+    parser.add_argument('--repo', action='append', dest='repos', help='Repository to analyze (owner/repo); may be repeated')
+    parser.add_argument('--org', help='Analyze every repository in this organization')
+    parser.add_argument('--full', action='store_true', help='Discard saved state and rebuild from the full history')
+    parser.add_argument('--first-response', action='store_true',
+                        help='Look up comments for first-response times (one call per commented issue without one)')
+    args = parser.parse_args()
+
+    repos = list(args.repos or [])
+    if args.org:
+        repos.extend(list_org_repositories(args.org))
+    if not repos and REPOSITORY:
+        repos.append(REPOSITORY)
+    if not repos:
+        parser.error("No repositories given; pass --repo/--org or set REPOSITORY")
+
+    generate_report(repos, full=args.full, first_response=args.first_response)
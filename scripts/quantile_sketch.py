@@ -0,0 +1,97 @@
+"""
+Mergeable streaming quantile sketch.
+
+A DDSketch keeps counts in logarithmically sized buckets, so every quantile
+it reports is within a fixed relative error of the true value while memory
+grows only with the logarithm of the value range, not with the number of
+samples. Two sketches with the same accuracy merge by adding bucket counts,
+and a previously added value can be removed again, which lets incremental
+analysis retract an issue's old contribution.
+"""
+
+import math
+from collections import Counter
+from typing import Dict, Optional
+
+# Values at or below this are counted in the zero bucket
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class DDSketch:
+    """Quantile sketch with relative-error guarantees (Masson et al., 2019)."""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = Counter()
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Add a value; a negative weight removes previously added values."""
+        if value < 0:
+            raise ValueError("DDSketch only accepts non-negative values")
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            self.bins[key] += weight
+            if self.bins[key] <= 0:
+                del self.bins[key]
+        self.count += weight
+
+    def remove(self, value: float) -> None:
+        """Remove a value that was previously added."""
+        self.add(value, weight=-1)
+
+    def merge(self, other: 'DDSketch') -> None:
+        """Fold another sketch with the same accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.bins.update(other.bins)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the estimated q-quantile (0 <= q <= 1), or None if empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if self.count <= 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                return self._value(key)
+        return self._value(max(self.bins))
+
+    def to_dict(self) -> Dict:
+        """Serialize the sketch for persistence or transfer between processes."""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bins': {str(key): count for key, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DDSketch':
+        """Restore a sketch saved by to_dict."""
+        sketch = cls(data['relative_accuracy'])
+        sketch.bins.update({int(key): count for key, count in data['bins'].items()})
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        return sketch
@@ -0,0 +1,312 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from code_symbols import extract_symbols, identifiers
+from config import SYMBOL_INDEX_DIR, SYMBOL_INDEX_MAX_FILE_BYTES
+from github_graphql import GraphQLClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = '1'
+
+# Source files worth indexing; everything else in the tree is skipped before it is fetched
+INDEXED_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.go', '.rs', '.java', '.kt', '.rb', '.php',
+    '.c', '.h', '.cc', '.cpp', '.hpp', '.cs', '.swift', '.scala', '.sh',
+}
+
+BLOB_BATCH_SIZE = 50
+FETCH_WORKERS = 4
+
+HEAD_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) { defaultBranchRef { target { oid } } }
+}
+"""
+
+# A match on a definition's name weighs more than one in a path, which weighs more than any identifier
+SYMBOL_WEIGHT = 3.0
+PATH_WEIGHT = 2.0
+IDENTIFIER_WEIGHT = 1.0
+
+
+def is_indexed(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in INDEXED_EXTENSIONS
+
+
+class SymbolIndex:
+    """
+    Per-repository index of definitions and identifiers, kept on disk.
+
+    Each indexed file stores its blob SHA, its definitions (from ast for
+    Python, declaration patterns otherwise), the identifiers it uses and its
+    content. refresh() lists the tree at the default branch head and only
+    re-fetches and re-indexes blobs whose SHA changed. Queries run against
+    in-memory posting lists and read no network.
+    """
+
+    def __init__(self, repo_name: str, client: GraphQLClient, github, path: Optional[str] = None):
+        self.repo_name = repo_name
+        self.client = client
+        self.github = github
+        self.checked_at = 0.0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+        path = path or self.path_for(repo_name)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS files '
+            '(path TEXT PRIMARY KEY, sha TEXT, symbols TEXT, words TEXT, content TEXT)'
+        )
+        self.conn.commit()
+        if self._get_meta('version') != INDEX_VERSION:
+            self.conn.execute('DELETE FROM meta')
+            self.conn.execute('DELETE FROM files')
+            self._set_meta('version', INDEX_VERSION)
+            self.conn.commit()
+
+        self._load()
+
+    @staticmethod
+    def path_for(repo_name: str) -> str:
+        """Return the default index file for a repository."""
+        return os.path.join(SYMBOL_INDEX_DIR, f"{repo_name.replace('/', '__')}.db")
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    @property
+    def head(self) -> Optional[str]:
+        """The commit the index was last brought up to date with."""
+        return self._get_meta('head')
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.files
+
+    def _load(self) -> None:
+        """Build the in-memory posting lists from the saved index."""
+        self.files: Dict[str, Dict] = {}
+        self.symbol_postings: Dict[str, Set[Tuple[str, int]]] = defaultdict(set)
+        self.path_postings: Dict[str, Set[str]] = defaultdict(set)
+        self.word_postings: Dict[str, Set[str]] = defaultdict(set)
+        for path, sha, symbols, words in self.conn.execute('SELECT path, sha, symbols, words FROM files'):
+            self._add(path, sha, json.loads(symbols), json.loads(words))
+
+    def _add(self, path: str, sha: str, symbols: List[Dict], words: List[str]) -> None:
+        self.files[path] = {'sha': sha, 'symbols': symbols, 'words': words}
+        for position, symbol in enumerate(symbols):
+            for word in identifiers(symbol['name']):
+                self.symbol_postings[word].add((path, position))
+        for word in identifiers(path.replace('/', ' ').replace('.', ' ')):
+            self.path_postings[word].add(path)
+        for word in words:
+            self.word_postings[word].add(path)
+
+    def _remove(self, path: str) -> None:
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return
+        for position, symbol in enumerate(entry['symbols']):
+            for word in identifiers(symbol['name']):
+                self.symbol_postings[word].discard((path, position))
+        for word in identifiers(path.replace('/', ' ').replace('.', ' ')):
+            self.path_postings[word].discard(path)
+        for word in entry['words']:
+            self.word_postings[word].discard(path)
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the default branch head, re-indexing only changed blobs."""
+        with self._refresh_lock:
+            owner, name = self.repo_name.split('/')
+            repository = self.client.execute(HEAD_QUERY, {'owner': owner, 'name': name})['repository']
+            head = ((((repository or {}).get('defaultBranchRef') or {}).get('target')) or {}).get('oid')
+            self.checked_at = time.monotonic()
+            if not head or head == self.head:
+                return
+
+            tree = self.github.get_repo(self.repo_name, lazy=True).get_git_tree(head, recursive=True)
+            if tree.raw_data.get('truncated'):
+                logger.warning(f"Tree of {self.repo_name} is truncated, indexing the listed part only")
+            blobs = {
+                element.path: element.sha
+                for element in tree.tree
+                if element.type == 'blob' and is_indexed(element.path)
+                and (element.size or 0) <= SYMBOL_INDEX_MAX_FILE_BYTES
+            }
+            self.update(head, blobs)
+
+    def update(self, head: str, blobs: Dict[str, str]) -> None:
+        """
+        Re-index the paths whose blob SHA differs from the indexed one.
+
+        blobs maps every indexable path in the tree at head to its blob SHA;
+        indexed paths missing from it are dropped.
+        """
+        with self._lock:
+            changed = {path: sha for path, sha in blobs.items() if self.files.get(path, {}).get('sha') != sha}
+            removed = [path for path in self.files if path not in blobs]
+
+        fetched = self._fetch_objects([(path, 'oid', sha) for path, sha in changed.items()])
+        self._apply(head, {path: (changed[path], blob['text']) for path, blob in fetched.items()}, removed)
+
+    def apply_push(self, before: str, after: str, changed: Iterable[str], removed: Iterable[str]) -> None:
+        """
+        Move the index from before to after using a push's changed-file lists.
+
+        Only the changed paths are fetched, at after. If the index is not at
+        before (it is empty, or a push was missed) it is refreshed in full.
+        """
+        if self.head != before:
+            logger.info(f"Symbol index of {self.repo_name} is not at {before[:7]}, refreshing in full")
+            self.refresh()
+            return
+
+        with self._refresh_lock:
+            if self.head != before:
+                # A concurrent refresh already moved the index on
+                return
+            changed = [path for path in changed if is_indexed(path)]
+            fetched = self._fetch_objects([(path, 'expression', f"{after}:{path}") for path in changed])
+            contents = {
+                path: (blob['oid'], blob['text']) for path, blob in fetched.items()
+                if blob['byteSize'] <= SYMBOL_INDEX_MAX_FILE_BYTES
+            }
+            # Changed paths that are no longer indexable text are dropped as well
+            dropped = [path for path in changed if path not in contents] + list(removed)
+            self._apply(after, contents, [path for path in dropped if path in self.files])
+            self.checked_at = time.monotonic()
+
+    def _apply(self, head: str, contents: Dict[str, Tuple[str, str]], removed: List[str]) -> None:
+        """Index contents ({path: (blob SHA, text)}), drop removed and record head, in one transaction."""
+        with self._lock:
+            for path in removed:
+                self._remove(path)
+                self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+            for path, (sha, content) in contents.items():
+                symbols = extract_symbols(path, content)
+                words = sorted(identifiers(content))
+                self._remove(path)
+                self._add(path, sha, symbols, words)
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO files (path, sha, symbols, words, content) VALUES (?, ?, ?, ?, ?)',
+                    (path, sha, json.dumps(symbols), json.dumps(words), content)
+                )
+            self._set_meta('head', head)
+            self.conn.commit()
+        logger.info(
+            f"Indexed {self.repo_name} at {head[:7]}: {len(contents)} files re-indexed, "
+            f"{len(removed)} removed, {len(self.files)} total"
+        )
+
+    def _fetch_objects(self, items: List[Tuple[str, str, str]]) -> Dict[str, Dict]:
+        """
+        Fetch text blobs in aliased GraphQL batches run concurrently.
+
+        items are (path, argument, value) triples, where argument is 'oid'
+        (value is a blob SHA) or 'expression' (value is '<commit>:<path>').
+        Returns the oid, byteSize and text of each path that is a text blob.
+        """
+        owner, name = self.repo_name.split('/')
+        batches = [items[i:i + BLOB_BATCH_SIZE] for i in range(0, len(items), BLOB_BATCH_SIZE)]
+        types = {'oid': 'GitObjectID!', 'expression': 'String!'}
+
+        def fetch_batch(batch: List[Tuple[str, str, str]]) -> Dict[str, Dict]:
+            declarations = ['$owner: String!', '$name: String!']
+            fields = []
+            variables = {'owner': owner, 'name': name}
+            for i, (_, argument, value) in enumerate(batch):
+                declarations.append(f'$arg{i}: {types[argument]}')
+                variables[f'arg{i}'] = value
+                fields.append(f'blob{i}: object({argument}: $arg{i}) {{ ... on Blob {{ oid byteSize text isBinary }} }}')
+            query = f"query({', '.join(declarations)}) {{ repository(owner: $owner, name: $name) {{ {' '.join(fields)} }} }}"
+            repository = self.client.execute(query, variables)['repository']
+            blobs = {}
+            for i, (path, _, _) in enumerate(batch):
+                blob = repository.get(f'blob{i}') or {}
+                if blob.get('text') is not None and not blob.get('isBinary'):
+                    blobs[path] = blob
+            return blobs
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            for blobs in executor.map(fetch_batch, batches):
+                fetched.update(blobs)
+        return fetched
+
+    def search(self, text: str, limit: int = 5) -> List[Dict]:
+        """
+        Rank indexed files by how well they match the identifiers and words in text.
+
+        Each match is weighted by its kind and by how rare the word is across
+        the repository. Returns up to limit dicts with path, score and the
+        matching definitions.
+        """
+        words = identifiers(text)
+        with self._lock:
+            total = len(self.files) or 1
+            scores: Dict[str, float] = defaultdict(float)
+            matched_symbols: Dict[str, Set[int]] = defaultdict(set)
+
+            for word in words:
+                symbol_hits = self.symbol_postings.get(word, ())
+                if symbol_hits:
+                    idf = math.log(1 + total / len({path for path, _ in symbol_hits}))
+                    for path, position in symbol_hits:
+                        scores[path] += SYMBOL_WEIGHT * idf
+                        matched_symbols[path].add(position)
+                path_hits = self.path_postings.get(word, ())
+                if path_hits:
+                    idf = math.log(1 + total / len(path_hits))
+                    for path in path_hits:
+                        scores[path] += PATH_WEIGHT * idf
+                word_hits = self.word_postings.get(word, ())
+                if word_hits:
+                    idf = math.log(1 + total / len(word_hits))
+                    for path in word_hits:
+                        scores[path] += IDENTIFIER_WEIGHT * idf
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [
+                {
+                    'path': path,
+                    'score': score,
+                    'sha': self.files[path]['sha'],
+                    'symbols': [self.files[path]['symbols'][position] for position in sorted(matched_symbols[path])],
+                }
+                for path, score in ranked
+            ]
+
+    def get_content(self, paths: Iterable[str]) -> Dict[str, str]:
+        """Return the indexed content of paths."""
+        paths = list(paths)
+        if not paths:
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT path, content FROM files WHERE path IN ({', '.join('?' for _ in paths)})",
+                paths
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,53 @@
+import unittest
+
+from ai_engine import AIEngine
+
+RESPONSE_WITH_CONSIDERATIONS = """## Explanation of Changes
+Log requests in app.py.
+
+## Files to Modify
+- app.py
+
+## Changes
+**app.py**
+```python
+import logging
+
+logger = logging.getLogger(__name__)
+```
+
+## Considerations
+Install the new dependency first:
+```bash
+pip install foo
+```
+"""
+
+
+def make_engine(edit_format: str) -> AIEngine:
+    """An engine with only what response parsing needs, so no API clients are created."""
+    engine = AIEngine.__new__(AIEngine)
+    engine.edit_format = edit_format
+    return engine
+
+
+class ParseFileBlocksTest(unittest.TestCase):
+    def test_ignores_code_blocks_under_later_sections(self):
+        changes = make_engine('whole')._parse_file_blocks(RESPONSE_WITH_CONSIDERATIONS)
+        self.assertEqual(changes, {'app.py': 'import logging\n\nlogger = logging.getLogger(__name__)\n'})
+
+    def test_only_first_block_after_filename_counts(self):
+        response = "**app.py**\n```\nx = 1\n```\nExample:\n```\nx\n```\n"
+        self.assertEqual(make_engine('whole')._parse_file_blocks(response), {'app.py': 'x = 1\n'})
+
+    def test_repeated_path_replaces_in_whole_mode(self):
+        response = "**app.py**\n```\nx = 1\n```\n**app.py**\n```\nx = 2\n```\n"
+        self.assertEqual(make_engine('whole')._parse_file_blocks(response), {'app.py': 'x = 2\n'})
+
+    def test_repeated_path_concatenates_in_diff_mode(self):
+        response = "**app.py**\n```\nfirst edit\n```\n**app.py**\n```\nsecond edit\n```\n"
+        self.assertEqual(make_engine('diff')._parse_file_blocks(response), {'app.py': 'first edit\nsecond edit\n'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Worker processes for WORKER_MODE=external.
+
+The webhook server only writes jobs to the shared job store. Each worker
+process started here claims jobs from it under a lease, runs them through
+the same journaled pipeline the server uses inline, and renews the lease
+while a job runs. If a worker dies its lease runs out and another worker
+reclaims the job, resuming after its last completed step.
+"""
+
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from dotenv import load_dotenv
+from config import GITHUB_TOKEN, JOB_JOURNAL_PATH, JOB_LEASE_SECONDS, WORKER_POLL_INTERVAL, validate_config
+from job_journal import JobJournal, new_worker_id
+from job_runner import run_job
+from notifications import get_dispatcher
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def work(journal, ai_engine, github_handler, once: bool = False):
+    """Claim and run jobs until stopped; with once, return when no job is waiting."""
+    while True:
+        job = journal.claim(new_worker_id())
+        if job is None:
+            if once:
+                return
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+        logger.info(f"Claimed job {job.id} for issue #{job.issue_number} in {job.repo_name}")
+        try:
+            run_job(job, ai_engine, github_handler)
+        except Exception as e:
+            # run_job reports its own failures; this only keeps the loop alive
+            logger.error(f"Error running job {job.id}: {str(e)}")
+
+
+def run_process(threads: int, once: bool):
+    """Entry point of one worker process: its own clients and journal connection, shared by its threads."""
+    # Imported here so every spawned process builds its own clients and caches
+    from ai_engine import AIEngine
+    from github_handler import GitHubHandler
+
+    journal = JobJournal(JOB_JOURNAL_PATH, JOB_LEASE_SECONDS)
+    ai_engine = AIEngine(GITHUB_TOKEN)
+    github_handler = GitHubHandler(GITHUB_TOKEN)
+
+    workers = [
+        threading.Thread(target=work, args=(journal, ai_engine, github_handler, once), name=f'worker-{i}')
+        for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    journal.close()
+    # Send notifications still waiting for their digest window
+    get_dispatcher().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run jobs queued by the webhook server in WORKER_MODE=external.')
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes to start')
+    parser.add_argument('--threads', type=int, default=1, help='Jobs each process runs at once')
+    parser.add_argument('--once', action='store_true', help='Exit once no job is waiting instead of polling')
+    args = parser.parse_args()
+
+    load_dotenv()
+    validate_config()
+
+    if args.processes == 1:
+        run_process(args.threads, args.once)
+        return
+
+    # Spawn rather than fork, so no process inherits another's SQLite connection or HTTP sessions
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=run_process, args=(args.threads, args.once), name=f'worker-process-{i}')
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {args.processes} worker processes with {args.threads} threads each")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping workers; their jobs will be reclaimed once their leases expire")
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()